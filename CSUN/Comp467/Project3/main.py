@@ -4,14 +4,42 @@
 
 ## imports ##
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import fnmatch
+from functools import lru_cache
+import json
+import os
 from pathlib import Path
 import re
 import subprocess
+import sys
+import threading
+import time
+
+# shared helpers for all the comp467 tools live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+import probecache
+
+# pillow is optional, without it stills just go through ffmpeg like everything else
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
 
 ## functions ##
 
-# renames the new file based on input and version num
-def versionName(file, owner, out_suffix=None):
+# output names look like <base>_VFX_<owner>_vNN<ext>
+OUTPUT_RE = re.compile(r"^(?P<base>.+)_VFX_(?P<owner>[^_]+)_v(?P<v>\d{2,})(?P<ext>\.[^.]*)?$")
+
+# dir -> {(base stem, owner, ext): highest vNN}, each dir gets scanned once and
+# then kept up to date as outputs are reserved, so picking a version isnt a
+# glob over the whole folder every time
+_version_index = {}
+_version_lock = threading.Lock()
+
+
+# split a file into (dir, base stem, ext) the way versionName names things
+def _versionKey(file, out_suffix=None):
     path = Path(file)
     ext = out_suffix if out_suffix is not None else path.suffix
 
@@ -21,16 +49,286 @@ def versionName(file, owner, out_suffix=None):
     m = re.match(r"^(?P<base>.+)_VFX_[^_]+_v\d{2}$", path.stem)
     base_stem = m.group("base") if m else path.stem
 
-    # find latest version
-    v_max = 0
-    for f in path.parent.glob(f"{base_stem}_VFX_{owner}_v*{ext}"):
-        m2 = re.search(r"_v(\d{2})", f.name)
-        if m2:
-            v_max = max(v_max, int(m2.group(1)))
+    return path.parent, base_stem, ext
+
+
+# the version index for a directory, one scandir the first time (hold _version_lock)
+def _dirVersions(directory):
+    key = os.path.abspath(directory)
+    versions = _version_index.get(key)
+    if versions is None:
+        versions = {}
+        with os.scandir(key) as entries:
+            for entry in entries:
+                m = OUTPUT_RE.match(entry.name)
+                if m:
+                    k = (m.group("base"), m.group("owner"), m.group("ext") or "")
+                    versions[k] = max(versions.get(k, 0), int(m.group("v")))
+        _version_index[key] = versions
+    return versions
+
+
+# renames the new file based on input and version num. read only, nothing
+# gets created so two callers can get the same name back, anything that
+# actually gets written goes through reserveName (which builds its names here).
+# v picks a version instead of the next free one
+def versionName(file, owner, out_suffix=None, v=None):
+    parent, base_stem, ext = _versionKey(file, out_suffix)
+
+    if v is None:
+        # find latest version, inc v
+        with _version_lock:
+            v = _dirVersions(parent).get((base_stem, owner, ext), 0) + 1
+
+    return parent / f"{base_stem}_VFX_{owner}_v{v:02d}{ext}"
+
+
+# still image types, these get -frames:v 1 and are the only things makeGif loops
+STILL_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+# everything a folder run picks up
+MEDIA_EXTS = STILL_EXTS + (".gif",)
+
+
+# same shape as OUTPUT_RE but for one owner only (owners with _ in them too)
+@lru_cache(maxsize=None)
+def _ownerOutputRe(owner):
+    return re.compile(rf"^.+_VFX_{re.escape(owner)}_v\d{{2,}}(\.[^.]*)?$")
+
+
+# is name an output of owner's (anyone's if owner is None)
+def isOutput(name, owner=None):
+    if owner is None:
+        return OUTPUT_RE.match(name) is not None
+    return _ownerOutputRe(owner).match(name) is not None
+
+
+# glob match against the path relative to the root or just the name,
+# so both "*.png" and "shots/*/plates/*" work
+def _globMatch(rel, name, patterns):
+    return any(fnmatch.fnmatch(rel, pat) or fnmatch.fnmatch(name, pat) for pat in patterns)
+
+
+# lazily yields media files under root with os.scandir, one directory listing
+# at a time so processing starts before a huge tree is done being walked.
+# owner's own _VFX_<owner>_vNN outputs get skipped unless include_outputs
+# (other people's outputs are just more input), excluded dirs dont get
+# walked at all, symlinked dirs arent followed
+def iterMedia(root, recursive=True, include=None, exclude=None, include_outputs=False, owner=None):
+    root = Path(root)
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            print(f"cant read {directory}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel = Path(entry.path).relative_to(root).as_posix()
+
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and not (exclude and _globMatch(rel, entry.name, exclude)):
+                    subdirs.append(Path(entry.path))
+                continue
+
+            if not entry.is_file():
+                continue
+            if os.path.splitext(entry.name)[1].lower() not in MEDIA_EXTS:
+                continue
+            if not include_outputs and isOutput(entry.name, owner):
+                continue
+            if include and not _globMatch(rel, entry.name, include):
+                continue
+            if exclude and _globMatch(rel, entry.name, exclude):
+                continue
+
+            yield Path(entry.path)
+
+        # depth first, in name order
+        stack.extend(reversed(subdirs))
+
+
+# versionName, but the file gets created right away (O_EXCL) and the index
+# bumped so the name is ours. two outputs picked before either exists (or by
+# two workers at once) cant land on the same vNN
+def reserveName(file, owner, out_suffix=None):
+    parent, base_stem, ext = _versionKey(file, out_suffix)
+    key = (base_stem, owner, ext)
+
+    with _version_lock:
+        versions = _dirVersions(parent)
+        v = versions.get(key, 0) + 1
+        while True:
+            candidate = versionName(file, owner, out_suffix, v)
+            try:
+                os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+            except FileExistsError:
+                # made by something outside this run since the scan
+                v += 1
+                continue
+            versions[key] = v
+            return candidate
+
+
+# set by --jobs > 1, ffmpeg chatter from a bunch of workers at once is
+# unreadable so it only gets shown when a run fails
+quiet_ffmpeg = False
+
+
+# delete reserved outputs that never got finished, an empty or half written
+# file with a real vNN would pass for a good render and push the next version up
+def discardOutputs(output_paths):
+    for output_path in output_paths:
+        Path(output_path).unlink(missing_ok=True)
+
+
+# run ffmpeg for the given outputs, they get cleaned up if it fails for
+# any reason (bad exit, no ffmpeg on PATH, ctrl-c...)
+def runFfmpeg(cmd, output_paths):
+    try:
+        if quiet_ffmpeg:
+            result = subprocess.run(cmd, capture_output = True, text = True)
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+        else:
+            subprocess.run(cmd, check=True)
+    except BaseException:
+        discardOutputs(output_paths)
+        raise
+
+
+# "auto" does single frame stills in process with pillow (when its installed),
+# "ffmpeg" sends everything to ffmpeg like before. set from --backend
+still_backend = "auto"
+
+THUMB_SIZE = (320, 180)
+
+
+# the watermark font, loaded once and shared by every still. same look as the
+# drawtext filter: arial if its around, something close if not
+@lru_cache(maxsize=8)
+def loadFont(size):
+    for name in ("arial.ttf", "Arial.ttf", "DejaVuSans.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def watermarkImage(img, text):
+    img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+    draw = ImageDraw.Draw(img)
+    draw.text((50, 50), text, font=loadFont(200), fill="black", stroke_width=15, stroke_fill="white")
+    return img
+
+
+def saveStill(img, output_path):
+    if Path(output_path).suffix.lower() in (".jpg", ".jpeg") and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.save(output_path, quality=95)
+
+
+# watermark and/or thumbnail a still without starting ffmpeg, the source gets
+# opened + decoded once for all of them. outputs is {"watermark"|"thumbnail": path}.
+# returns False (nothing written) if pillow cant or shouldnt do it, e.g. an
+# animated png/webp or multi page tiff, so the caller can fall back to ffmpeg
+def pillowStill(file, outputs):
+    path = Path(file)
+    if Image is None or still_backend == "ffmpeg" or path.suffix.lower() not in STILL_EXTS:
+        return False
+
+    try:
+        with Image.open(path) as img:
+            if getattr(img, "is_animated", False):
+                return False
+
+            if "watermark" not in outputs:
+                # thumbnail only, jpeg can decode straight at 1/2, 1/4, 1/8 size
+                img.draft("RGB", THUMB_SIZE)
+            img.load()
+
+            for name, output_path in outputs.items():
+                if name == "watermark":
+                    saveStill(watermarkImage(img, path.stem), output_path)
+                else:
+                    saveStill(img.resize(THUMB_SIZE, Image.BICUBIC), output_path)
+    except (OSError, ValueError) as e:
+        # ffmpeg overwrites whatever got written (and cleans up if it fails too)
+        print(f"pillow couldnt do {path} ({e}), using ffmpeg")
+        return False
+    except BaseException:
+        discardOutputs(outputs.values())
+        raise
+
+    return True
+
+
+def watermarkFilter(text):
+    return f"drawtext=font='Arial':text='{text}':x=50:y=50:fontsize=200:fontcolor=black:bordercolor=white:borderw=15"
+
+
+# watermark + thumbnail + gif in one ffmpeg run. the source gets decoded once
+# and split into a branch per output instead of one ffmpeg (and decode) each
+def processCombined(file, owner, watermark=False, thumbnail=False, gif=False, fps=24):
+    path = Path(file)
+    is_still = path.suffix.lower() in STILL_EXTS
+    is_gif = path.suffix.lower() == ".gif"
+
+    # (name, filter chain, output path, output options)
+    branches = []
+    if watermark:
+        chain = watermarkFilter(path.stem)
+        if is_gif:
+            # same palette trick as addWatermark so gif colors dont get mangled
+            chain += ",split[wa][wb];[wa]palettegen[wp];[wb][wp]paletteuse"
+        branches.append(("watermark", chain, reserveName(file, owner, path.suffix), []))
+
+    if thumbnail:
+        branches.append(("thumbnail", "scale=320:180", reserveName(file, owner), []))
+
+    # makeGif only ever loops stills
+    if gif and is_still:
+        # loop the one decoded frame into 1 sec worth, like -loop 1 -t 1 did
+        chain = f"loop=loop={fps - 1}:size=1:start=0,setpts=N/({fps}*TB)"
+        branches.append(("gif", chain, reserveName(file, owner, ".gif"), ["-r", str(fps)]))
+
+    outputs = {name: output_path for name, _, output_path, _ in branches}
+
+    # stills: watermark + thumbnail in process off one pillow decode, ffmpeg
+    # only gets started for the gif (if that was asked for)
+    still_outputs = {name: p for name, p in outputs.items() if name != "gif"}
+    if is_still and still_outputs and pillowStill(path, still_outputs):
+        for name, output_path in still_outputs.items():
+            print(f"{name} ->", output_path)
+        branches = [b for b in branches if b[0] == "gif"]
+
+    if not branches:
+        return outputs
+
+    labels = [f"s{i}" for i in range(len(branches))]
+    graph = [f"[0:v]split={len(branches)}" + "".join(f"[{l}]" for l in labels)]
+    for i, (_, chain, _, _) in enumerate(branches):
+        graph.append(f"[s{i}]{chain}[o{i}]")
+
+    cmd = ["ffmpeg", "-y", "-i", str(path), "-filter_complex", ";".join(graph)]
+    for i, (name, _, output_path, opts) in enumerate(branches):
+        cmd += ["-map", f"[o{i}]", *opts]
+        if is_still and name != "gif":
+            cmd.extend(["-frames:v", "1", "-update", "1"])
+        cmd.append(str(output_path))
+
+    print("Input Path:", path)
+    for name, _, output_path, _ in branches:
+        print(f"{name} ->", output_path)
+
+    runFfmpeg(cmd, [output_path for _, _, output_path, _ in branches])
 
-    # inc v
-    v_next = v_max + 1
-    return path.parent / f"{base_stem}_VFX_{owner}_v{v_next:02d}{ext}"
+    return outputs
 
 
 # adds watermark to file
@@ -39,11 +337,11 @@ def addWatermark(file, owner):
 
     # for gif files
     if path.suffix.lower() == ".gif":
-        output_path = versionName(file, owner, ".gif")
+        output_path = reserveName(file, owner, ".gif")
     
     # for other files
     else:
-        output_path = versionName(file, owner, out_suffix = path.suffix)
+        output_path = reserveName(file, owner, out_suffix = path.suffix)
         
     watermark_text = path.stem
 
@@ -51,13 +349,18 @@ def addWatermark(file, owner):
     print("Output Path:", output_path)
     print("Watermark Text:", watermark_text)
 
+    # plain stills dont need ffmpeg at all
+    if pillowStill(path, {"watermark": output_path}):
+        print("Watermarked file created:", output_path)
+        return output_path
+
     # color handling for gif
     if path.suffix.lower() == ".gif":
         cmd = [
             "ffmpeg", "-y",
             "-i", str(path),
             "-filter_complex",
-            f"[0:v]drawtext=font='Arial':text='{watermark_text}':x=50:y=50:fontsize=200:fontcolor=black:bordercolor=white:borderw=15,split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse",
+            f"[0:v]{watermarkFilter(watermark_text)},split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse",
             str(output_path)
         ]
     # color handling for image
@@ -65,7 +368,7 @@ def addWatermark(file, owner):
         cmd = [
             "ffmpeg", "-y",
             "-i", str(path),
-            "-vf", f"drawtext=font='Arial':text='{watermark_text}':x=50:y=50:fontsize=200:fontcolor=black:bordercolor=white:borderw=15",
+            "-vf", watermarkFilter(watermark_text),
         ]
 
         # set a 1 frame limit
@@ -74,17 +377,20 @@ def addWatermark(file, owner):
 
         cmd.append(str(output_path))
 
-    subprocess.run(cmd, check=True)
+    runFfmpeg(cmd, [output_path])
     print("Watermarked file created:", output_path)
     return output_path
 
 # makes 320x180 thumbnail
 def createThumbnail(file, owner):
     path = Path(file)
-    output_path = versionName(file, owner)
+    output_path = reserveName(file, owner)
     print("Input Path:", path)
     print("Output Path:", output_path)
 
+    if pillowStill(path, {"thumbnail": output_path}):
+        return output_path
+
     cmd = [
         "ffmpeg", "-y",
         "-i", str(path),
@@ -95,19 +401,19 @@ def createThumbnail(file, owner):
         cmd.extend(["-frames:v", "1", "-update", "1"])
 
     cmd.append(str(output_path))
-    subprocess.run(cmd, check=True)
+    runFfmpeg(cmd, [output_path])
     return output_path
 
 
 # loop image for gif creation
 def makeGif(file, owner, fps = 24):
     path = Path(file)
-    output_path = versionName(file, owner, ".gif")
-
     print("Input Path:", path)
-    print("Output Gif:", output_path)
 
     if path.suffix.lower() in (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"):
+        output_path = reserveName(file, owner, ".gif")
+        print("Output Gif:", output_path)
+
         cmd = [
             "ffmpeg", "-y",
             "-loop", "1",
@@ -117,7 +423,7 @@ def makeGif(file, owner, fps = 24):
             str(output_path)
         ]
 
-        subprocess.run(cmd, check=True)
+        runFfmpeg(cmd, [output_path])
         print("GIF created:", output_path)
         return output_path
 
@@ -127,26 +433,85 @@ def extractMetadata(file, owner):
     path = Path(file)
     print(f"Metadata for {path}:")
 
-    cmd = [
-        "ffprobe",
-        "-v", "quiet",
-        "-print_format", "json",
-        "-show_format",
-        "-show_streams",
-        str(path)
-    ]
-
-    result = subprocess.run(cmd, capture_output = True, text = True)
+    # same -show_format -show_streams probe as before, but cached so
+    # re-running on a folder doesnt ffprobe every file again
+    info = probecache.probe(str(path), probecache.FORMAT_AND_STREAMS)
+    if info is None:
+        print("ffprobe couldnt read", path)
+        info = {}
 
     # write to txt file
     output_txt = path.parent / f"{path.stem}_VFX_{owner}_metadata.txt"
     with open(output_txt, "w", encoding="utf-8") as f:
-        f.write(result.stdout)
+        json.dump(info, f, indent=4)
 
     print("Metadata exported to:", output_txt)
     return output_txt
 
 
+# everything asked for on one file
+def processFile(file_path, args, combined):
+    if combined:
+        processCombined(
+            file_path, args.owner,
+            watermark = args.watermark,
+            thumbnail = args.thumbnail,
+            gif = args.gif,
+            fps = 24,
+        )
+    else:
+        if args.watermark:
+            addWatermark(file_path, args.owner)
+
+        if args.thumbnail:
+            createThumbnail(file_path, args.owner)
+
+        if args.gif:
+            makeGif(file_path, args.owner, fps = 24)
+
+    if args.metadata:
+        extractMetadata(file_path, args.owner)
+
+
+# runs processFile over files on a pool of jobs threads (the real work is in
+# ffmpeg so threads are plenty), one bad file doesnt stop the rest. files can
+# be a lazy walker, only a few per worker get pulled ahead so work starts
+# right away. returns ([(file, error)] for everything that failed, files done)
+def processFiles(files, args, combined, jobs = 1):
+    failures = []
+    done = 0
+    total = f"/{len(files)}" if hasattr(files, "__len__") else ""
+    t0 = time.perf_counter()
+
+    def finish(fut, file_path):
+        nonlocal done
+        err = fut.exception()
+        if isinstance(err, subprocess.CalledProcessError) and err.stderr:
+            # last line of ffmpeg's complaint is usually the useful one
+            err = err.stderr.strip().splitlines()[-1]
+
+        done += 1
+        if err is not None:
+            failures.append((file_path, err))
+        status = "FAILED" if err is not None else "done"
+        print(f"[{done}{total}] {status} {file_path} ({time.perf_counter() - t0:.1f}s)")
+
+    window = max(jobs, 1) * 4
+    pending = {}
+    with ThreadPoolExecutor(max_workers = max(jobs, 1)) as pool:
+        for f in files:
+            if len(pending) >= window:
+                finished, _ = wait(pending, return_when = FIRST_COMPLETED)
+                for fut in finished:
+                    finish(fut, pending.pop(fut))
+            pending[pool.submit(processFile, f, args, combined)] = f
+
+        for fut in as_completed(list(pending)):
+            finish(fut, pending.pop(fut))
+
+    return failures, done
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("file", help = "enter file name or path")
@@ -155,6 +520,13 @@ def main():
     parser.add_argument("--gif", action = "store_true", help = "convert to gif")
     parser.add_argument("--thumbnail", action = "store_true", help = "create")
     parser.add_argument("--metadata", action = "store_true", help = "extract metadata")
+    parser.add_argument("--separate", action = "store_true", help = "one ffmpeg run per output instead of one combined run")
+    parser.add_argument("--backend", choices = ["auto", "ffmpeg"], default = "auto", help = "auto = stills done in process with pillow when possible, ffmpeg = always ffmpeg")
+    parser.add_argument("--jobs", type = int, default = 1, help = "files to process at the same time for folder inputs")
+    parser.add_argument("--recursive", "-r", action = "store_true", help = "walk subfolders too for folder inputs")
+    parser.add_argument("--include", action = "append", help = "glob of files to take from a folder (repeatable)")
+    parser.add_argument("--exclude", action = "append", help = "glob of files/folders to skip (repeatable)")
+    parser.add_argument("--include-outputs", action = "store_true", help = "also process files that are already _VFX_<owner>_vNN outputs")
 
     args = parser.parse_args()
 
@@ -171,28 +543,35 @@ def main():
     path = Path(args.file)
     if path.is_dir():
         print("Folder detected...")
-        media_exts = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp", ".gif")
-        files = [
-            f for f in path.iterdir() if f.suffix.lower() in media_exts
-        ]
+        # streamed, files start getting processed while the walk is still going
+        files = iterMedia(
+            path,
+            recursive = args.recursive,
+            include = args.include,
+            exclude = args.exclude,
+            include_outputs = args.include_outputs,
+            owner = args.owner,
+        )
     else:
         files = [path]
 
     #new_name = versionName(args.file, args.owner)
     #print("New file name:", new_name)
 
+    # more than one ffmpeg output per file -> do them all off one decode
+    combined = not args.separate and (args.watermark + args.thumbnail + args.gif) > 1
+
+    global quiet_ffmpeg, still_backend
+    quiet_ffmpeg = args.jobs > 1
+    still_backend = args.backend
+
     # function calls based on args
-    for file_path in files:
-        if args.watermark:
-            addWatermark(file_path, args.owner)
-        
-        if args.thumbnail:
-            createThumbnail(file_path, args.owner)
-        
-        if args.gif:
-            makeGif(file_path, args.owner, fps = 24)
+    failures, n_done = processFiles(files, args, combined, jobs = args.jobs)
 
-        if args.metadata:
-            extractMetadata(file_path, args.owner)
+    if failures:
+        print(f"{len(failures)} of {n_done} files failed:")
+        for file_path, err in failures:
+            print(f"  {file_path}: {err}")
+        sys.exit(1)
 
 main()
@@ -0,0 +1,64 @@
+## bench for the frame range engine ##
+# times the numpy frames_to_ranges against the old pure python one
+# usage: python3 bench_ranges.py [--sizes 10000 1000000 50000000]
+
+import argparse
+import time
+
+import numpy as np
+
+from main import frames_to_ranges, frames_to_ranges_py
+
+
+# fake dirt fix frames, roughly half the frames in the span are hit so
+# there are lots of short runs and lots of gaps like a real export
+def make_frames(n, seed=467):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, n * 2, size=n, dtype=np.int32)
+
+
+def time_it(fn, frames):
+    t0 = time.perf_counter()
+    ranges = fn(frames)
+    return time.perf_counter() - t0, ranges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bench frames_to_ranges")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[10_000, 1_000_000, 50_000_000],
+        help="frame counts to try",
+    )
+    parser.add_argument(
+        "--skip-py",
+        action="store_true",
+        help="only time the numpy engine (the py one at 50M takes a while and a lot of ram)",
+    )
+    args = parser.parse_args()
+
+    print(f"{'frames':>12} {'ranges':>12} {'python s':>10} {'numpy s':>10} {'speedup':>8}")
+    for n in args.sizes:
+        frames = make_frames(n)
+
+        np_s, np_ranges = time_it(frames_to_ranges, frames)
+
+        if args.skip_py:
+            print(f"{n:>12} {len(np_ranges):>12} {'-':>10} {np_s:>10.3f} {'-':>8}")
+            continue
+
+        # the old path always got a plain list of ints
+        frame_list = frames.tolist()
+        py_s, py_ranges = time_it(frames_to_ranges_py, frame_list)
+        del frame_list
+
+        if py_ranges != np_ranges:
+            print(f"range mismatch at {n} frames!")
+
+        print(f"{n:>12} {len(np_ranges):>12} {py_s:>10.3f} {np_s:>10.3f} {py_s / np_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
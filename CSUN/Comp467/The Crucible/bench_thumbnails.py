@@ -0,0 +1,41 @@
+## bench for thumbnail extraction ##
+# times one ffmpeg per thumbnail (make_thumbnail) vs the single pass batch (make_thumbnails)
+# usage: python3 bench_thumbnails.py trailer.mp4 [--count 100]
+
+import argparse
+import time
+
+from main import get_video_info, make_thumbnail, make_thumbnails
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bench thumbnail extraction")
+    parser.add_argument("video", help="video file to pull thumbnails from")
+    parser.add_argument("--count", type=int, default=100, help="how many thumbnails to grab")
+    parser.add_argument("--span", type=int, default=2000, help="spread the frames over this many frames")
+    args = parser.parse_args()
+
+    fps, _, _ = get_video_info(args.video)
+
+    # evenly spread frames, like midpoints of handle ranges across a trailer
+    step = max(args.span // args.count, 1)
+    frames = [i * step for i in range(args.count)]
+
+    t0 = time.perf_counter()
+    for idx, f in enumerate(frames, start=1):
+        make_thumbnail(args.video, f, fps, idx)
+    per_frame_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    paths = make_thumbnails(args.video, frames)
+    batch_s = time.perf_counter() - t0
+
+    made = sum(1 for p in paths if p)
+    print(f"{args.count} thumbnails ({made} written by batch)")
+    print(f"per frame: {per_frame_s:.2f}s ({per_frame_s / args.count * 1000:.0f} ms each)")
+    print(f"batch:     {batch_s:.2f}s")
+    print(f"speedup:   {per_frame_s / batch_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,99 @@
 import csv
 import argparse
-from typing import List, Dict, Tuple
-from pymongo import MongoClient
+from array import array
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
+from pymongo import MongoClient, UpdateOne, ASCENDING
 import subprocess
 import json
+import hashlib
+import openpyxl
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as XLImage
+from openpyxl.writer.excel import ExcelWriter
 import os
+import re
+import glob
+from bisect import bisect_left, bisect_right
+import shutil
+import tempfile
+from zipfile import ZipFile, ZIP_DEFLATED
+from concurrent.futures import ProcessPoolExecutor
+import sys
+import time
+from functools import lru_cache
+import threading
+import queue
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
+
+# shared helpers for all the comp467 tools live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+import timecode as tc_lib
+import probecache
+
+# show the trailer demo pulls frames for
+DEFAULT_SHOW = "Planeshifter"
+
+# vimeo api root, point it at a local stub to test uploads
+VIMEO_API = "https://api.vimeo.com"
+
+# how much of a clip goes out per tus PATCH
+TUS_CHUNK_SIZE = 8 * 1024 * 1024
+
+# (connect, read) seconds for every vimeo/tus request so a dead connection
+# errors out instead of hanging an upload worker forever
+HTTP_TIMEOUT = (10, 60)
+
+# where rendered clips/thumbnails + the manifest live between runs
+CACHE_DIR = ".ps_cache"
+
+# bump these if the ffmpeg settings change so old artifacts stop matching
+CLIP_SETTINGS = "libx264/aac"
+THUMB_SETTINGS = "png/96x74"
 
 ## function definitions ##
 
+# known storage roots, a path starting with one of these just gets it chopped
+# off in one regex match instead of the split + scan below
+# (regexes, add more per facility with --storage-root)
+STORAGE_ROOTS: List[str] = [
+    r"/baselightfilesystem\d*",
+    r"/hpsans\d+/production",
+]
+
+_storage_root_re = None
+_storage_roots: List[str] = []
+
+
+def set_storage_roots(roots: List[str]) -> None:
+    global _storage_root_re, _storage_roots
+
+    _storage_roots = list(roots)
+    alts = "|".join(f"(?:{r.rstrip('/')})" for r in roots)
+    _storage_root_re = re.compile(f"^(?:{alts})(?=/|$)") if roots else None
+
+    # old results might be wrong for the new table
+    strip_storage_prefix.cache_clear()
+
+
 # normalize path
+# cached + interned, exports repeat the same few hundred dirs millions of times
+@lru_cache(maxsize=16384)
 def strip_storage_prefix(path: str) -> str:
 
-    parts = path.strip().split("/")
+    path = path.strip()
+
+    if _storage_root_re is not None:
+        m = _storage_root_re.match(path)
+        if m:
+            rest = path[m.end():].strip("/")
+            if "//" in rest:
+                rest = "/".join(p for p in rest.split("/") if p)
+            return sys.intern(rest)
+
+    parts = path.split("/")
 
     # remove empty segments
     parts = [p for p in parts if p]
@@ -28,7 +107,16 @@ def strip_storage_prefix(path: str) -> str:
         idx = 1 if len(parts) > 1 else 0
 
     norm = "/".join(parts[idx:])
-    return norm
+    return sys.intern(norm)
+
+
+# hit/miss counters for the path cache
+def path_cache_stats() -> Dict[str, int]:
+    info = strip_storage_prefix.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+
+set_storage_roots(STORAGE_ROOTS)
 
 
 # baselight parsing
@@ -42,28 +130,166 @@ def load_baselight_export(line: str) -> Dict:
     path = tokens[0]
     frame_strs = tokens[1:]
 
-    frames: List[int] = []
-    for tok in frame_strs:
-        try:
-            frames.append(int(tok))
-        except ValueError:
-            continue
+    # frames go straight into a packed int array, way smaller than a list of ints
+    try:
+        frames = array("i", map(int, frame_strs))
+    except ValueError:
+        # some junk token in the line, fall back to skipping the bad ones
+        frames = array("i")
+        for tok in frame_strs:
+            try:
+                frames.append(int(tok))
+            except ValueError:
+                continue
 
     return {
-        "raw_path": path,
+        "raw_path": sys.intern(path),
         "norm_path": strip_storage_prefix(path),
         "frames": frames,
     }
 
 
-def parse_baselight_file(path: str) -> List[Dict]:
+# stream one frame block per line, never holds the whole file
+def iter_baselight_blocks(path: str) -> Iterator[Dict]:
 
-    entries: List[Dict] = []
     with open(path, "r") as f:
         for line in f:
             entry = load_baselight_export(line)
             if entry:
-                entries.append(entry)
+                yield entry
+
+
+def parse_baselight_file(path: str) -> List[Dict]:
+    return list(iter_baselight_blocks(path))
+
+
+# turn --baselight/--xytech args (files, globs or dirs) into a flat file list
+def expand_inputs(specs: List[str]) -> List[str]:
+
+    files: List[str] = []
+    for spec in specs:
+        if os.path.isdir(spec):
+            files.extend(sorted(
+                os.path.join(spec, name) for name in os.listdir(spec)
+                if name.endswith(".txt") and os.path.isfile(os.path.join(spec, name))
+            ))
+        elif any(c in spec for c in "*?["):
+            files.extend(sorted(p for p in glob.glob(spec) if os.path.isfile(p)))
+        else:
+            files.append(spec)
+
+    # same file from two specs only gets parsed once
+    return list(dict.fromkeys(os.path.normpath(f) for f in files))
+
+
+# parallel runs hand workers byte ranges of about this much instead of whole
+# files, so what a worker sends back (and the few results the parent holds
+# at once) stays small however big one export is
+BASELIGHT_SHARD_BYTES = 16 * 1024 * 1024
+
+
+# (path, start, end) byte ranges covering every file, in file order
+def _baselight_ranges(paths: List[str], shard_bytes: int = BASELIGHT_SHARD_BYTES) -> List[Tuple[str, int, int]]:
+
+    ranges = []
+    for path in paths:
+        size = os.path.getsize(path)
+        ranges.extend(
+            (path, start, min(start + shard_bytes, size))
+            for start in range(0, size, shard_bytes)
+        )
+    return ranges
+
+
+# worker side, every line that starts inside [start, end) of one file. a line
+# running over start belongs to the range before, one running over end to this one
+def _parse_baselight_shard(shard: Tuple[str, int, int]) -> List[Dict]:
+
+    path, start, end = shard
+    blocks = []
+    with open(path, "rb") as f:
+        if start:
+            # back up one byte so a line starting right on start isnt skipped
+            f.seek(start - 1)
+            f.readline()
+
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+
+            b = load_baselight_export(line.decode())
+            if b:
+                b["source"] = path
+                blocks.append(b)
+    return blocks
+
+
+def _parse_xytech_shard(path: str) -> List[Dict]:
+
+    entries = load_xytech_locations(path)
+    for x in entries:
+        x["source"] = path
+    return entries
+
+
+# worker start up, spawned workers dont see roots added with --storage-root
+def _init_worker(roots: List[str]) -> None:
+    set_storage_roots(roots)
+
+
+# like executor.map but only keeps a few shards in flight, so finished
+# results dont pile up in memory while an earlier file is still parsing
+def _bounded_map(executor, fn, items: List, window: int) -> Iterator:
+
+    pending = []
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.pop(0).result()
+
+    for fut in pending:
+        yield fut.result()
+
+
+# parse a bunch of baselight files across processes, yields blocks in file order.
+# big files get split over workers too, not just one file per worker
+def iter_baselight_shards(paths: List[str], workers: int = 1) -> Iterator[Dict]:
+
+    ranges = _baselight_ranges(paths) if workers > 1 else []
+    if len(ranges) <= 1:
+        for path in paths:
+            for b in iter_baselight_blocks(path):
+                b["source"] = path
+                yield b
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(_storage_roots,),
+    ) as ex:
+        for blocks in _bounded_map(ex, _parse_baselight_shard, ranges, workers * 2):
+            yield from blocks
+
+
+def load_xytech_files(paths: List[str], workers: int = 1) -> List[Dict]:
+
+    entries: List[Dict] = []
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            entries.extend(_parse_xytech_shard(path))
+        return entries
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(_storage_roots,),
+    ) as ex:
+        for shard in ex.map(_parse_xytech_shard, paths):
+            entries.extend(shard)
     return entries
 
 
@@ -95,7 +321,53 @@ def load_xytech_locations(path: str) -> List[Dict]:
 
 
 # frame to range helpers
-def frames_to_ranges(frames: List[int]) -> List[Tuple[int, int]]:
+def as_frame_array(frames) -> np.ndarray:
+
+    # packed arrays from the parser can be viewed without copying
+    if isinstance(frames, array):
+        if not frames:
+            return np.empty(0, dtype=np.intc)
+        return np.frombuffer(frames, dtype=np.intc)
+
+    return np.asarray(frames, dtype=np.int32)
+
+
+def unique_frames(frames) -> np.ndarray:
+
+    # plain sort + neighbour compare, np.unique is a lot slower on big int arrays
+    srt = np.sort(as_frame_array(frames))
+    if srt.size == 0:
+        return srt
+
+    keep = np.empty(srt.size, dtype=bool)
+    keep[0] = True
+    np.not_equal(srt[1:], srt[:-1], out=keep[1:])
+    return srt[keep]
+
+
+# numpy range engine, sort, diff, then split wherever the gap is bigger than 1
+# (dupes just show up as a 0 gap so they never need removing first)
+def frames_to_range_arrays(frames) -> Tuple[np.ndarray, np.ndarray]:
+
+    srt = np.sort(as_frame_array(frames))
+    if srt.size == 0:
+        return srt, srt
+
+    breaks = np.flatnonzero(np.diff(srt) > 1)
+    starts = srt[np.concatenate(([0], breaks + 1))]
+    ends = srt[np.concatenate((breaks, [srt.size - 1]))]
+
+    return starts, ends
+
+
+def frames_to_ranges(frames) -> List[Tuple[int, int]]:
+
+    starts, ends = frames_to_range_arrays(frames)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+# original pure python version, kept around for bench_ranges.py
+def frames_to_ranges_py(frames: List[int]) -> List[Tuple[int, int]]:
 
     if not frames:
         return []
@@ -121,32 +393,104 @@ def format_range(r: Tuple[int, int]) -> str:
     return f"{a}" if a == b else f"{a}-{b}"
 
 
+# prefix trie over normalized path segments, so a baselight path can land
+# on the deepest xytech location above it in O(path depth)
+class PathIndex:
+
+    class _Node:
+        __slots__ = ("children", "key")
+
+        def __init__(self):
+            self.children = {}
+            self.key = None
+
+    def __init__(self):
+        self.root = PathIndex._Node()
+        self.size = 0
+
+    def add(self, norm_path: str, key=None) -> None:
+        segs = [p for p in norm_path.split("/") if p]
+        if not segs:
+            # an empty location would swallow every path, skip it
+            return
+
+        node = self.root
+        for seg in segs:
+            nxt = node.children.get(seg)
+            if nxt is None:
+                nxt = node.children[seg] = PathIndex._Node()
+            node = nxt
+
+        if node.key is None:
+            self.size += 1
+        node.key = norm_path if key is None else key
+
+    # returns (key, "exact" | "prefix") or (None, None) if nothing is above it
+    def lookup(self, norm_path: str) -> Tuple[Optional[str], Optional[str]]:
+        segs = [p for p in norm_path.split("/") if p]
+
+        node = self.root
+        best = None
+        best_depth = 0
+        for depth, seg in enumerate(segs, start=1):
+            node = node.children.get(seg)
+            if node is None:
+                break
+            if node.key is not None:
+                best = node.key
+                best_depth = depth
+
+        if best is None:
+            return None, None
+
+        return best, ("exact" if best_depth == len(segs) else "prefix")
+
+
 # matching and csv export
 def build_match_table(
-    baselight_entries: List[Dict],
+    baselight_entries: Iterable[Dict],
     xytech_entries: List[Dict],
 ) -> List[Dict]:
 
-    # build a lookup from stripped path to matching entries
-    bl_map: Dict[str, List[Dict]] = {}
+    index = PathIndex()
+    for x in xytech_entries:
+        index.add(x["norm_path"])
+
+    # same few paths show up over and over, so remember each lookup
+    lookups: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+    # only hang on to frames for paths the workorder actually asks for,
+    # so baselight can be a generator and nothing else gets kept around
+    bl_frames: Dict[str, array] = {}
+    match_kinds: Dict[str, set] = {}
     for e in baselight_entries:
-        bl_map.setdefault(e["norm_path"], []).append(e)
+        norm = e["norm_path"]
+        hit = lookups.get(norm)
+        if hit is None:
+            hit = lookups[norm] = index.lookup(norm)
+
+        loc, kind = hit
+        if loc is None:
+            continue
+
+        bl_frames.setdefault(loc, array("i")).extend(e["frames"])
+        match_kinds.setdefault(loc, set()).add(kind)
 
     matches: List[Dict] = []
     for x in xytech_entries:
         norm = x["norm_path"]
-        if norm in bl_map:
-            frames: List[int] = []
-            for e in bl_map[norm]:
-                frames.extend(e["frames"])
-
-            ranges = frames_to_ranges(frames)
-            formatted_ranges = [format_range(r) for r in ranges]
+        if norm in bl_frames:
+            starts, ends = frames_to_range_arrays(bl_frames[norm])
+            formatted_ranges = [format_range(r) for r in zip(starts.tolist(), ends.tolist())]
 
             matches.append({
                 "xytech_path": x["raw_path"],
                 "norm_path": norm,
                 "frame_ranges": formatted_ranges,
+                # numeric copies for the parquet/arrow writers
+                "range_starts": starts,
+                "range_ends": ends,
+                "match_type": "+".join(sorted(match_kinds[norm])),
             })
 
     return matches
@@ -163,94 +507,396 @@ def write_matches_to_csv(matches: List[Dict], output_csv_path: str) -> None:
                 writer.writerow([m["xytech_path"], fr])
 
 
+# rows per record batch for the columnar writers
+MATCH_BATCH_ROWS = 1_000_000
+
+MATCH_FORMATS = ("csv", "parquet", "arrow")
+
+
+# typed schema for the columnar outputs, one row per frame range
+def match_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("xytech_path", pa.string()),
+        ("norm_path", pa.string()),
+        ("range_start", pa.int64()),
+        ("range_end", pa.int64()),
+        ("frame_count", pa.int64()),
+    ])
+
+
+# matches -> arrow record batches of about batch_rows rows. everything is per
+# match or per batch, the paths go in as a dictionary + repeated indices and
+# get decoded in arrow, so theres no python work per range
+def iter_match_batches(matches: List[Dict], batch_rows: int = MATCH_BATCH_ROWS):
+    import pyarrow as pa
+
+    schema = match_schema()
+    pending: List[Dict] = []
+    n_rows = 0
+
+    def flush():
+        counts = np.array([m["range_starts"].size for m in pending], dtype=np.int32)
+        idx = pa.array(np.repeat(np.arange(len(pending), dtype=np.int32), counts))
+
+        starts = np.concatenate([m["range_starts"] for m in pending]).astype(np.int64)
+        ends = np.concatenate([m["range_ends"] for m in pending]).astype(np.int64)
+
+        columns = [
+            pa.DictionaryArray.from_arrays(idx, pa.array([m[col] for m in pending], pa.string())).cast(pa.string())
+            for col in ("xytech_path", "norm_path")
+        ]
+        columns += [pa.array(starts), pa.array(ends), pa.array(ends - starts + 1)]
+        return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    for m in matches:
+        if m["range_starts"].size == 0:
+            continue
+        pending.append(m)
+        n_rows += m["range_starts"].size
+        if n_rows >= batch_rows:
+            yield flush()
+            pending, n_rows = [], 0
+
+    if pending:
+        yield flush()
+
+
+def write_matches_to_parquet(matches: List[Dict], output_path: str) -> None:
+    import pyarrow.parquet as pq
+
+    with pq.ParquetWriter(output_path, match_schema()) as writer:
+        for batch in iter_match_batches(matches):
+            writer.write_batch(batch)
+
+
+# arrow ipc file (feather v2), memory maps straight into pyarrow/polars
+def write_matches_to_arrow(matches: List[Dict], output_path: str) -> None:
+    import pyarrow as pa
+
+    with pa.OSFile(output_path, "wb") as sink, pa.ipc.new_file(sink, match_schema()) as writer:
+        for batch in iter_match_batches(matches):
+            writer.write_batch(batch)
+
+
+def write_matches(matches: List[Dict], output_path: str, fmt: str = "csv") -> None:
+
+    if fmt == "csv":
+        write_matches_to_csv(matches, output_path)
+    elif fmt == "parquet":
+        write_matches_to_parquet(matches, output_path)
+    elif fmt == "arrow":
+        write_matches_to_arrow(matches, output_path)
+    else:
+        raise ValueError(f"unknown match output format: {fmt}")
+
+    print(f"wrote matches to {output_path} ({fmt})")
+
+
 # mongo helpers
 def get_db():
     client = MongoClient("mongodb://localhost:27017/")
     return client["proj4_db"]
 
 
-def save_baselight_to_db(db, baselight_entries, source_name):
+# show name is just the first segment of the normalized path
+def show_from_norm(norm_path: str) -> str:
+    return norm_path.split("/", 1)[0]
+
+
+# a path's frames get split over docs by frame // this (chunk_no) so no doc
+# can grow toward mongo's 16MB cap however many lines hit the same path.
+# 100k int32s tops out around 1.2MB of bson
+BASELIGHT_CHUNK_FRAMES = 100_000
+
+
+# bumped when the stored layout changes, the db remembers which one it's at
+# (meta collection) so the migration runs once instead of scanning every start.
+#   1: baseline, insert_many per line, dupes and all, no show/chunk_no
+#   2: upserted per (source, raw_path, chunk_no), unique keys
+DB_SCHEMA_VERSION = 2
+
+
+# made once at start up, the unique compound keys are what the upserts filter
+# on (and cover lookups by source alone). unique so two writers racing an
+# upsert cant both insert
+def ensure_indexes(db):
+    schema = db["meta"].find_one({"_id": "schema"}) or {}
+    if schema.get("version", 1) < DB_SCHEMA_VERSION:
+        _migrate_db(db)
+        db["meta"].update_one(
+            {"_id": "schema"}, {"$set": {"version": DB_SCHEMA_VERSION}}, upsert=True
+        )
+
+    # only after the migration, old dbs have dupes these would choke on
+    db["baselight"].create_index(
+        [("source", ASCENDING), ("raw_path", ASCENDING), ("chunk_no", ASCENDING)], unique=True
+    )
+    db["xytech"].create_index([("source", ASCENDING), ("raw_path", ASCENDING)], unique=True)
+    for name in ("baselight", "xytech"):
+        db[name].create_index("norm_path")
+
+    db["baselight"].create_index("show")
+
+
+# one time move to schema 2. safe to rerun if it dies partway, the marker only
+# gets set once it's all done
+def _migrate_db(db):
+    print("updating the db to the new layout, one time thing")
+
+    # the upserts below filter on (source, raw_path), old dbs may not have any
+    # index on it at all. a unique one (from a half done run) is left alone
+    for name in ("baselight", "xytech"):
+        if "source_1_raw_path_1" not in db[name].index_information():
+            db[name].create_index([("source", ASCENDING), ("raw_path", ASCENDING)])
+
+    # docs saved before the show field existed get it filled in server side
+    db["baselight"].update_many(
+        {"show": {"$exists": False}},
+        [{"$set": {"show": {"$arrayElemAt": [{"$split": ["$norm_path", "/"]}, 0]}}}],
+    )
+
+    _chunk_old_baselight(db)
+    _dedupe_old_xytech(db)
+
+    # baselight's old key is covered by the chunk_no one now, xytech's has to
+    # be rebuilt as unique
+    db["baselight"].drop_index("source_1_raw_path_1")
+    if not db["xytech"].index_information()["source_1_raw_path_1"].get("unique"):
+        db["xytech"].drop_index("source_1_raw_path_1")
+
+
+# docs from before chunk_no (one per line, same path on lots of them, every
+# rerun adding more) get merged into chunks and dropped, a batch at a time
+def _chunk_old_baselight(db, batch_size=1000):
     coll = db["baselight"]
 
-    docs = []
-    for e in baselight_entries:
-        docs.append({
-            "source": source_name,
-            "raw_path": e["raw_path"],
-            "norm_path": e["norm_path"],
-            "frames": e["frames"],
+    entries, ids = [], []
+    n_old = 0
+    for d in coll.find({"chunk_no": {"$exists": False}}):
+        entries.append({
+            "source": d.get("source"),
+            "raw_path": d["raw_path"],
+            "norm_path": d["norm_path"],
+            "frames": d.get("frames", []),
         })
+        ids.append(d["_id"])
+
+        if len(ids) >= batch_size:
+            save_baselight_to_db(db, entries, batch_size=batch_size)
+            coll.delete_many({"_id": {"$in": ids}})
+            n_old += len(ids)
+            entries, ids = [], []
 
-    if docs:
-        coll.insert_many(docs)
+    if ids:
+        save_baselight_to_db(db, entries, batch_size=batch_size)
+        coll.delete_many({"_id": {"$in": ids}})
+        n_old += len(ids)
 
+    if n_old:
+        print(f"merged {n_old} old baselight docs into frame chunks")
 
-def save_xytech_to_db(db, xytech_entries, source_name):
+
+# baseline runs inserted the xytech rows again every time, keep one per key
+def _dedupe_old_xytech(db, batch_size=1000):
     coll = db["xytech"]
 
-    docs = []
-    for x in xytech_entries:
-        docs.append({
-            "source": source_name,
-            "raw_path": x["raw_path"],
-            "norm_path": x["norm_path"],
-        })
+    dupes = coll.aggregate([
+        {"$group": {
+            "_id": {"source": "$source", "raw_path": "$raw_path"},
+            "ids": {"$push": "$_id"},
+            "n": {"$sum": 1},
+        }},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+    extra = []
+    n_removed = 0
+    for d in dupes:
+        extra.extend(d["ids"][1:])
+        if len(extra) >= batch_size:
+            coll.delete_many({"_id": {"$in": extra}})
+            n_removed += len(extra)
+            extra = []
+
+    if extra:
+        coll.delete_many({"_id": {"$in": extra}})
+        n_removed += len(extra)
+
+    if n_removed:
+        print(f"dropped {n_removed} duplicate xytech rows")
+
+
+def _flush_baselight(coll, batch: Dict[Tuple[str, str, int], Dict]) -> None:
+
+    ops = [
+        UpdateOne(
+            {"source": source, "raw_path": raw_path, "chunk_no": chunk_no},
+            {
+                "$set": {"norm_path": b["norm_path"], "show": show_from_norm(b["norm_path"])},
+                # same path can show up on lots of lines, frames just get unioned
+                # (deduped here first so the update itself stays small too)
+                "$addToSet": {"frames": {"$each": unique_frames(b["frames"]).tolist()}},
+            },
+            upsert=True,
+        )
+        for (source, raw_path, chunk_no), b in batch.items()
+    ]
+    coll.bulk_write(ops, ordered=False)
+
 
-    if docs:
-        coll.insert_many(docs)
+# upserts keyed on (source, raw_path, chunk_no), so saving the same export
+# twice is a no-op
+def save_baselight_to_db(db, baselight_entries, source_name=None, batch_size=1000):
+    coll = db["baselight"]
 
+    # lines for the same path + chunk in one batch get merged before they go out
+    batch: Dict[Tuple[str, str, int], Dict] = {}
+    for e in baselight_entries:
+        source = e.get("source", source_name)
+        frames = as_frame_array(e["frames"])
 
-def process_video(video_path: str, vimeo_token=None):
+        # almost every line sits inside one chunk, only split when it doesnt
+        lo, hi = (frames.min(), frames.max()) if frames.size else (0, 0)
+        if lo // BASELIGHT_CHUNK_FRAMES == hi // BASELIGHT_CHUNK_FRAMES:
+            parts = [(int(lo) // BASELIGHT_CHUNK_FRAMES, frames)]
+        else:
+            chunk_nos = frames // BASELIGHT_CHUNK_FRAMES
+            parts = [(int(c), frames[chunk_nos == c]) for c in unique_frames(chunk_nos).tolist()]
 
-    print(f"yo, gonna process video: {video_path}")
+        for chunk_no, part in parts:
+            key = (source, e["raw_path"], chunk_no)
+            b = batch.get(key)
+            if b is None:
+                b = batch[key] = {"norm_path": e["norm_path"], "frames": array("i")}
+            b["frames"].frombytes(part.astype(np.intc, copy=False).tobytes())
 
-    db = get_db()
+        if len(batch) >= batch_size:
+            _flush_baselight(coll, batch)
+            batch = {}
 
-    ps_entries = get_planeshifter_entries(db)
-    print(f"found {len(ps_entries)} planeshifter entries")
+    if batch:
+        _flush_baselight(coll, batch)
 
-    all_frames = []
-    for e in ps_entries:
-        all_frames.extend(e["frames"])
-    
-    # only print unique frames
-    all_frames = sorted(set(all_frames))
 
-    ps_ranges = add_handles_to_frames(all_frames)
+# pass blocks through to the matcher while batching them into mongo on the side,
+# so many files still end up as one stream of writes over one connection
+def tee_baselight_to_db(db, baselight_entries, batch_size=1000) -> Iterator[Dict]:
 
-    print("ranges w/ handles:")
-    for r in ps_ranges:
-        print(r)
+    batch = []
+    for e in baselight_entries:
+        batch.append(e)
+        if len(batch) >= batch_size:
+            save_baselight_to_db(db, batch, batch_size=batch_size)
+            batch = []
+        yield e
+
+    if batch:
+        save_baselight_to_db(db, batch, batch_size=batch_size)
+
+
+def save_xytech_to_db(db, xytech_entries, source_name=None, batch_size=1000):
+    coll = db["xytech"]
+
+    ops = []
+    for x in xytech_entries:
+        ops.append(UpdateOne(
+            {"source": x.get("source", source_name), "raw_path": x["raw_path"]},
+            {"$set": {"norm_path": x["norm_path"]}},
+            upsert=True,
+        ))
+
+        if len(ops) >= batch_size:
+            coll.bulk_write(ops, ordered=False)
+            ops = []
+
+    if ops:
+        coll.bulk_write(ops, ordered=False)
+
+
+def process_video(
+    video_path: str,
+    vimeo_token=None,
+    show=DEFAULT_SHOW,
+    jobs=1,
+    render_mode="encode",
+    merge_gap=0,
+    upload_jobs=4,
+    cache=None,
+):
+
+    print(f"yo, gonna process video: {video_path}")
+
+    db = get_db()
+
+    # cursor gets streamed, only the frames come back from mongo
+    all_frames = array("i")
+    n_entries = 0
+    for e in get_planeshifter_entries(db, show):
+        all_frames.extend(e["frames"])
+        n_entries += 1
+    print(f"found {n_entries} {show} entries")
     
-    # pull fps + starting tc from video
-    fps, start_tc = get_video_info(video_path)
+    # pull fps + starting tc + length from video
+    fps, start_tc, total_frames = get_video_info(video_path)
     print(f"video fps looks like: {fps}")
+    drop_frame = False
     if start_tc:
         print(f"video start timecode: {start_tc}")
         base_frame = timecode_to_frames(start_tc, fps)
+        # ; before the frames is how drop frame timecode gets written
+        drop_frame = ";" in start_tc and tc_lib.is_drop_frame_rate(fps)
     else:
         print("no timecode found, assuming base 00:00:00:00")
         base_frame = 0
 
-    # convert frame ranges to tc ranges
+    # only print unique frames
+    all_frames = unique_frames(all_frames)
+
+    # overlapping windows become one clip, and nothing runs past the end of the video
+    max_frame = total_frames - 1 if total_frames else None
+    ps_ranges = add_handles_to_frames(
+        all_frames,
+        fps=fps,
+        merge_gap=merge_gap,
+        max_frame=max_frame,
+    )
+    print(f"{all_frames.size} frames -> {len(ps_ranges)} ranges w/ handles")
+
+    print("ranges w/ handles:")
+    for r in ps_ranges:
+        print(r)
+
+    # thumbnails, renders and uploads all overlap, see run_clip_pipeline
+    mids = [(start_f + end_f) // 2 for start_f, end_f in ps_ranges]
+    thumb_paths, clip_paths, uploads = run_clip_pipeline(
+        video_path,
+        ps_ranges,
+        mids,
+        fps,
+        jobs=jobs,
+        render_mode=render_mode,
+        vimeo_token=vimeo_token,
+        upload_jobs=upload_jobs,
+        cache=cache,
+    )
+
+    # convert frame ranges to tc ranges, all in one vectorized go
+    range_arr = np.asarray(ps_ranges, dtype=np.int64).reshape(-1, 2) + base_frame
+    start_tcs = tc_lib.frames_to_timecodes(range_arr[:, 0], fps, drop_frame)
+    end_tcs = tc_lib.frames_to_timecodes(range_arr[:, 1], fps, drop_frame)
+
     tc_ranges = []
     for idx, (start_f, end_f) in enumerate(ps_ranges, start=1):
-        start_tc_str = frames_to_timecode(start_f, fps, base_frame)
-        end_tc_str = frames_to_timecode(end_f, fps, base_frame)
+        start_tc_str = start_tcs[idx - 1]
+        end_tc_str = end_tcs[idx - 1]
 
-        mid_f = (start_f + end_f) // 2
-        thumb_path = make_thumbnail(video_path, mid_f, fps, idx)  # you already have this
+        thumb_path = thumb_paths[idx - 1]
 
-        clip_path = render_clip(video_path, start_f, end_f, fps, idx)
+        clip_path = clip_paths[idx]
 
-        upload_info = None
-        if vimeo_token:
-            # give each clip a simple title
-            clip_title = f"planeshifter_{idx:02d}"
-            try:
-                upload_info = upload_clip_to_vimeo(vimeo_token, clip_path, clip_title)
-            except Exception as e:
-                print(f"vimeo upload for {clip_path} failed: {e}")
+        upload_info = uploads.get(idx)
 
         tc_ranges.append({
             "start_frame": start_f,
@@ -272,63 +918,423 @@ def process_video(video_path: str, vimeo_token=None):
     return tc_ranges
 
 
-# grab baselight entries that mention planeshifter
-def get_planeshifter_entries(db):
+# on disk manifest of everything process_video has made, keyed by a hash of
+# (source mtime+size, start, end, settings). reruns with the same source and
+# ranges pick the old clip/thumbnail/vimeo upload back up instead of redoing it.
+# artifacts live in the cache dir and get hard linked (or copied) into place
+class ArtifactCache:
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=None, force=False):
+        self.dir = cache_dir
+        self.path = os.path.join(cache_dir, "manifest.json")
+        self.max_bytes = max_bytes
+        self.force = force
+        self.lock = threading.Lock()
+        self.hits = 0
+        # hits only bump last_used in memory, evict() writes them out once per run
+        self.dirty = False
+
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    # cheap stand in for hashing a multi gb source, touching the file invalidates it
+    @staticmethod
+    def source_fingerprint(path):
+        st = os.stat(path)
+        return [os.path.realpath(path), st.st_size, st.st_mtime_ns]
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+    def artifact_path(self, key, ext):
+        return os.path.join(self.dir, key + ext)
+
+    # entry for key if its artifact is still on disk, None on a miss or with --force
+    def lookup(self, key):
+        if self.force:
+            return None
+        with self.lock:
+            e = self.entries.get(key)
+            if not e or not e.get("artifact") or not os.path.exists(e["artifact"]):
+                return None
+            e["last_used"] = time.time()
+            self.hits += 1
+            self.dirty = True
+            return dict(e)
+
+    # vimeo info from an earlier upload of the same clip
+    def uploaded(self, key):
+        if self.force:
+            return None
+        with self.lock:
+            return self.entries.get(key, {}).get("vimeo")
+
+    def record(self, key, **fields):
+        with self.lock:
+            e = self.entries.setdefault(key, {})
+            e.update(fields)
+            e["last_used"] = time.time()
+            if e.get("artifact") and os.path.exists(e["artifact"]):
+                e["size"] = os.path.getsize(e["artifact"])
+            self._save()
+
+    # write to a tmp file + rename so a crash never leaves half a manifest
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    # drop least recently used artifacts until the cache fits in max_bytes.
+    # the entry (and any vimeo uri) stays, only the file goes. also saves the
+    # last_used times from this run's hits, so call it once at the end of a run
+    def evict(self):
+        if self.max_bytes is None:
+            with self.lock:
+                if self.dirty:
+                    self._save()
+            return 0
+
+        with self.lock:
+            live = [
+                (e.get("last_used", 0), k)
+                for k, e in self.entries.items()
+                if e.get("artifact") and os.path.exists(e["artifact"])
+            ]
+            total = sum(self.entries[k].get("size", 0) for _, k in live)
+
+            removed = 0
+            for _, k in sorted(live):
+                if total <= self.max_bytes:
+                    break
+                e = self.entries[k]
+                os.remove(e["artifact"])
+                total -= e.get("size", 0)
+                e["artifact"] = None
+                e["size"] = 0
+                removed += 1
+
+            if removed or self.dirty:
+                self._save()
+
+        return removed
+
+
+# put a cached artifact at its normal name. the old file gets unlinked first so
+# ffmpeg -y on a later run can never write through a hard link into the cache
+def place_artifact(src, dst):
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+    return dst
+
+
+# busy time per pipeline stage, so its easy to see which one holds things up
+class StageTimer:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def add(self, stage, seconds, started, finished):
+        with self.lock:
+            st = self.stats.setdefault(stage, {"items": 0, "busy": 0.0, "first": started, "last": finished})
+            st["items"] += 1
+            st["busy"] += seconds
+            st["first"] = min(st["first"], started)
+            st["last"] = max(st["last"], finished)
+
+    def report(self):
+        print("stage timings:")
+        print(f"  {'stage':<10} {'items':>5} {'busy s':>8} {'wall s':>8} {'avg s':>7}")
+        for stage, st in self.stats.items():
+            wall = st["last"] - st["first"]
+            avg = st["busy"] / st["items"] if st["items"] else 0.0
+            print(f"  {stage:<10} {st['items']:>5} {st['busy']:>8.2f} {wall:>8.2f} {avg:>7.2f}")
+
+
+_PIPE_DONE = object()
+
+
+# staged producer/consumer pipeline for the planeshifter clips:
+#   thumbnails (one batch ffmpeg pass, off to the side)
+#   render  -> bounded queue ->  upload
+# so clip N can be uploading while clip N+1 is still encoding.
+# results are keyed by idx so naming/order stay the same no matter who finishes first
+def run_clip_pipeline(
+    video_path,
+    ps_ranges,
+    mids,
+    fps,
+    jobs=1,
+    render_mode="encode",
+    vimeo_token=None,
+    upload_jobs=4,
+    cache=None,
+):
+    timer = StageTimer()
+    n = len(ps_ranges)
+
+    # cache keys, a clip is the same clip if the source, range and settings are
+    if cache is not None:
+        source = cache.source_fingerprint(video_path)
+        rate = str(tc_lib.parse_rate(fps))
+        clip_keys = [
+            cache.key(source, start_f, end_f, CLIP_SETTINGS, render_mode, rate)
+            for start_f, end_f in ps_ranges
+        ]
+        thumb_keys = [cache.key(source, int(mid), THUMB_SETTINGS) for mid in mids]
+
+    render_q = queue.Queue()
+    # bounded so renders cant run miles ahead of a slow uplink
+    upload_q = queue.Queue(maxsize=max(upload_jobs, 1) * 2)
+
+    thumb_paths = [None] * n
+    clip_paths = {}
+    uploads = {}
+    counts = {"rendered": 0, "uploaded": 0}
+    lock = threading.Lock()
+
+    errors = []
+
+    # a worker never dies on one bad item, it reports it and keeps pulling
+    # until its stop marker, so the queues always drain and nothing upstream
+    # blocks forever on a put
+    def failed(what, e):
+        with lock:
+            errors.append(f"{what}: {e}")
+            print(f"{what} failed: {e}")
+
+    def thumb_worker():
+        t0 = time.perf_counter()
+        try:
+            if cache is None:
+                thumb_paths[:] = make_thumbnails(video_path, mids)
+            else:
+                # only the thumbnails that arent cached go through ffmpeg
+                todo = []
+                for i, mid in enumerate(mids):
+                    hit = cache.lookup(thumb_keys[i])
+                    if hit:
+                        thumb_paths[i] = place_artifact(hit["artifact"], f"thumb_{i + 1:02d}.png")
+                    else:
+                        todo.append(i)
+
+                made = make_thumbnails(
+                    video_path,
+                    [mids[i] for i in todo],
+                    names=[cache.artifact_path(thumb_keys[i], ".png") for i in todo],
+                )
+                for i, path in zip(todo, made):
+                    if path:
+                        cache.record(thumb_keys[i], kind="thumb", artifact=path, frame=int(mids[i]))
+                        thumb_paths[i] = place_artifact(path, f"thumb_{i + 1:02d}.png")
+                if len(todo) < n:
+                    print(f"{n - len(todo)} thumbnails came from the cache")
+        except Exception as e:
+            failed("thumbnails", e)
+        else:
+            for i, t in enumerate(thumb_paths):
+                if not t:
+                    failed(f"thumbnail {i + 1}", "ffmpeg didnt produce it")
+        t1 = time.perf_counter()
+        timer.add("thumbnail", t1 - t0, t0, t1)
+        print(f"thumbnails done ({sum(1 for t in thumb_paths if t)}/{n})")
+
+    def render_worker():
+        while True:
+            item = render_q.get()
+            if item is _PIPE_DONE:
+                return
+
+            idx, start_f, end_f = item
+            key = clip_keys[idx - 1] if cache else None
+            hit = None
+            clip_path = None
+            t0 = time.perf_counter()
+            try:
+                hit = cache.lookup(key) if cache else None
+                if hit:
+                    clip_path = place_artifact(hit["artifact"], f"ps_clip_{idx:02d}.mp4")
+                elif cache:
+                    # only a clean encode makes it to the cache path
+                    target = render_clip(
+                        video_path, start_f, end_f, fps, idx, render_mode,
+                        out_name=cache.artifact_path(key, ".mp4"),
+                    )
+                    if target:
+                        cache.record(key, kind="clip", artifact=target, start=start_f, end=end_f)
+                        clip_path = place_artifact(target, f"ps_clip_{idx:02d}.mp4")
+                else:
+                    clip_path = render_clip(video_path, start_f, end_f, fps, idx, render_mode)
+            except Exception as e:
+                failed(f"render of clip {idx}", e)
+                clip_path = None
+            else:
+                # a failed ffmpeg run comes back as None, not an exception
+                if clip_path is None:
+                    failed(f"render of clip {idx}", "ffmpeg didnt produce a clip")
+            t1 = time.perf_counter()
+            if not hit:
+                timer.add("render", t1 - t0, t0, t1)
+
+            with lock:
+                clip_paths[idx] = clip_path
+                counts["rendered"] += 1
+                if clip_path is None:
+                    print(f"[{counts['rendered']}/{n}] no clip {idx}")
+                else:
+                    how = "cached" if hit else "rendered"
+                    print(f"[{counts['rendered']}/{n}] {how} {clip_path}")
+
+            if vimeo_token and clip_path:
+                upload_q.put((idx, clip_path, key))
+
+    def upload_worker():
+        while True:
+            item = upload_q.get()
+            if item is _PIPE_DONE:
+                return
+
+            idx, clip_path, key = item
+            info = None
+            already = False
+            try:
+                info = cache.uploaded(key) if cache else None
+                already = bool(info)
+                if not already:
+                    t0 = time.perf_counter()
+                    try:
+                        # give each clip a simple title
+                        info = upload_clip_to_vimeo(vimeo_token, clip_path, f"planeshifter_{idx:02d}")
+                    finally:
+                        t1 = time.perf_counter()
+                        timer.add("upload", t1 - t0, t0, t1)
+
+                    if info and cache:
+                        cache.record(key, vimeo=info)
+            except Exception as e:
+                failed(f"vimeo upload for {clip_path}", e)
+            else:
+                # no upload_link from vimeo comes back as None too
+                if info is None:
+                    failed(f"vimeo upload for {clip_path}", "vimeo didnt give an upload link")
+
+            with lock:
+                uploads[idx] = info
+                counts["uploaded"] += 1
+                if info is None:
+                    print(f"[{counts['uploaded']}/{n}] not uploaded {clip_path}")
+                elif already:
+                    print(f"[{counts['uploaded']}/{n}] already on vimeo {clip_path} -> {info.get('link')}")
+                else:
+                    print(f"[{counts['uploaded']}/{n}] uploaded {clip_path}")
+
+    for idx, (start_f, end_f) in enumerate(ps_ranges, start=1):
+        render_q.put((idx, start_f, end_f))
+
+    thumb_thread = threading.Thread(target=thumb_worker)
+    renderers = [threading.Thread(target=render_worker) for _ in range(max(jobs, 1))]
+    uploaders = [threading.Thread(target=upload_worker) for _ in range(max(upload_jobs, 1))] if vimeo_token else []
+
+    wall0 = time.perf_counter()
+    for t in [thumb_thread, *renderers, *uploaders]:
+        t.start()
+
+    # one stop marker per worker, uploads only get theirs once every render is in
+    for _ in renderers:
+        render_q.put(_PIPE_DONE)
+    for t in renderers:
+        t.join()
+    for _ in uploaders:
+        upload_q.put(_PIPE_DONE)
+    for t in uploaders:
+        t.join()
+    thumb_thread.join()
+
+    if errors:
+        print(f"{len(errors)} pipeline step(s) failed:")
+        for err in errors:
+            print(f"  {err}")
+
+    timer.report()
+    print(f"  {'total':<10} {'':>5} {'':>8} {time.perf_counter() - wall0:>8.2f}")
+
+    if cache is not None:
+        evicted = cache.evict()
+        print(f"artifact cache: {cache.hits} hits" + (f", evicted {evicted} old artifacts" if evicted else ""))
+
+    return thumb_paths, clip_paths, uploads
+
+
+# grab baselight entries for a show (planeshifter by default)
+def get_planeshifter_entries(db, show=DEFAULT_SHOW):
     coll = db["baselight"]
-    # searching by substring in norm_path
-    return list(coll.find({"norm_path": {"$regex": "Planeshifter"}}))
+    # exact match on the indexed show field, no regex scan
+    return coll.find({"show": show}, {"frames": 1, "_id": 0})
 
 
-# add 2 sec handles around each frame
-def add_handles_to_frames(frames, fps=24, seconds=2):
+# add 2 sec handles around each frame, windows closer than merge_gap frames get
+# merged into one range and everything is clamped to the last real frame
+# (merge_gap=None keeps one window per frame like before)
+def add_handles_to_frames(frames, fps=24, seconds=2, merge_gap=0, max_frame=None):
     
-    if not frames:
+    frames = unique_frames(frames).astype(np.int64)
+    if frames.size == 0:
         return []
 
-    frames = sorted(frames)
+    handle = int(round(fps * seconds))
+    starts = np.maximum(frames - handle, 0)
+    ends = frames + handle
 
-    handle = fps * seconds
-    ranges = []
+    if max_frame is not None:
+        ends = np.minimum(ends, max_frame)
+        # frames past the end of the media dont get a window at all
+        keep = starts <= ends
+        starts, ends = starts[keep], ends[keep]
+        if starts.size == 0:
+            return []
 
-    for f in frames:
-        start = f - handle
-        end = f + handle
-        if start < 0:
-            start = 0
-        ranges.append((start, end))
+    if merge_gap is None:
+        return list(zip(starts.tolist(), ends.tolist()))
 
-    return ranges
+    # handles are all the same length so both ends are already sorted,
+    # a new range starts wherever the gap to the previous window is too big
+    breaks = np.flatnonzero(starts[1:] - ends[:-1] - 1 > merge_gap)
+    merged_starts = starts[np.concatenate(([0], breaks + 1))]
+    merged_ends = ends[np.concatenate((breaks, [ends.size - 1]))]
+
+    return list(zip(merged_starts.tolist(), merged_ends.tolist()))
 
 
-# use ffprobe to peek at fps and starting tc
+# use ffprobe to peek at fps, starting tc and how many frames there are
+# (goes through the shared probe cache, reruns on the same file skip ffprobe)
 def get_video_info(video_path: str):
     
-    cmd = [
-        "ffprobe",
-        "-v", "error",
+    data = probecache.probe(video_path, [
         "-select_streams", "v:0",
-        "-show_entries", "stream=avg_frame_rate:format_tags=timecode",
-        "-of", "json",
-        video_path,
-    ]
-
-    result = subprocess.run(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
+        "-show_entries", "stream=avg_frame_rate,nb_frames,duration:format=duration:format_tags=timecode",
+    ])
 
-    if result.returncode != 0:
-        print("ffprobe had an issue, falling back to 24fps, no tc")
-        return 24.0, None
-
-    data = json.loads(result.stdout or "{}")
+    if data is None:
+        print("ffprobe had an issue, falling back to 24fps, no tc, unknown length")
+        return 24.0, None, None
 
     fps = 24.0
     timecode_str = None
+    total_frames = None
 
     streams = data.get("streams", [])
+    fmt = data.get("format", {})
     if streams:
         s0 = streams[0]
         fr = s0.get("avg_frame_rate")
@@ -339,20 +1345,69 @@ def get_video_info(video_path: str):
             except ZeroDivisionError:
                 fps = 24.0
 
+        # nb_frames is exact when the container has it, else go off duration
+        nb = s0.get("nb_frames")
+        dur = s0.get("duration") or fmt.get("duration")
+        if nb and nb.isdigit():
+            total_frames = int(nb)
+        elif dur and dur != "N/A":
+            total_frames = int(round(float(dur) * fps))
+
     # timecode might sit under format.tags.timecode
-    fmt = data.get("format", {})
     tags = fmt.get("tags", {})
     tc = tags.get("timecode")
     if tc:
         timecode_str = tc
 
-    return fps, timecode_str
+    return fps, timecode_str, total_frames
+
+
+# codec params of the first video stream, plus where its first frame sits
+# relative to the file's start_time. ffmpeg's input -ss counts from the file
+# start_time, but frame numbers here (like select's n) count from the first
+# video frame, so every seek adds "offset". ts/mxf and b-frame mp4/mov without
+# an edit list all start above 0
+def get_stream_params(video_path: str, cache=None) -> Dict:
+
+    data = (cache or probecache.get_cache()).probe(video_path, [
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,profile,level,pix_fmt,width,height,has_b_frames,start_time:format=start_time",
+    ]) or {}
+
+    streams = data.get("streams", [])
+    s0 = streams[0] if streams else {}
+
+    def as_float(v):
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return None
+
+    stream_start = as_float(s0.get("start_time"))
+    fmt_start = as_float(data.get("format", {}).get("start_time"))
+
+    return {
+        "codec": s0.get("codec_name"),
+        "profile": s0.get("profile"),
+        "level": s0.get("level"),
+        "pix_fmt": s0.get("pix_fmt"),
+        "width": s0.get("width"),
+        "height": s0.get("height"),
+        "has_b_frames": int(s0.get("has_b_frames") or 0),
+        "stream_start": stream_start or 0.0,
+        "offset": (stream_start or 0.0) - (fmt_start or 0.0) if stream_start is not None else 0.0,
+    }
+
+
+# ffmpeg -ss value for a frame number
+def seek_seconds(video_path: str, frame, fps) -> float:
+    return get_stream_params(video_path)["offset"] + frame / fps
 
 
 # make a png thumbnail at mid of range
 def make_thumbnail(video_path, frame, fps, idx):
     # pick a time in seconds for ffmpeg
-    seconds = frame / fps if fps > 0 else frame / 24.0
+    seconds = seek_seconds(video_path, frame, fps if fps > 0 else 24.0)
 
     thumb_name = f"thumb_{idx:02d}.png"
 
@@ -377,59 +1432,154 @@ def make_thumbnail(video_path, frame, fps, idx):
     return thumb_name
 
 
-# tc string to frame num
-def timecode_to_frames(tc: str, fps: float) -> int:
-    
-    parts = tc.split(":")
-    if len(parts) != 4:
-        return 0
+# grab a bunch of thumbnails in one ffmpeg run, the select filter picks the
+# exact frame numbers so the source only gets demuxed/decoded once
+def make_thumbnails(video_path, frames, start_idx=1, names=None):
 
-    h = int(parts[0])
-    m = int(parts[1])
-    s = int(parts[2])
-    f = int(parts[3])
+    frames = [int(f) for f in frames]
+    if names is None:
+        names = [f"thumb_{idx:02d}.png" for idx in range(start_idx, start_idx + len(frames))]
+    if not frames:
+        return []
 
-    total = (((h * 60) + m) * 60 + s) * fps + f
-    return int(round(total))
+    wanted = sorted(set(frames))
+    select = "+".join(f"eq(n,{f})" for f in wanted)
+
+    with tempfile.TemporaryDirectory(prefix="thumbs_") as tmp:
+        pattern = os.path.join(tmp, "t_%06d.png")
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-i", video_path,
+            "-vf", f"select='{select}',scale=96:74",
+            "-vsync", "0",
+            "-frames:v", str(len(wanted)),  # stop decoding after the last one
+            pattern,
+        ]
+
+        subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+        # ffmpeg numbers outputs 1..n in frame order, map them back to each idx
+        by_frame = {f: pattern % (i + 1) for i, f in enumerate(wanted)}
+
+        paths = []
+        for f, name in zip(frames, names):
+            src = by_frame[f]
+            if os.path.exists(src):
+                shutil.copyfile(src, name)
+                paths.append(name)
+            else:
+                # frame past the end of the video or ffmpeg gave up
+                paths.append(None)
+
+    return paths
+
+
+# tc string to frame num, exact rates + drop frame come from the shared module
+def timecode_to_frames(tc: str, fps: float) -> int:
+
+    try:
+        return tc_lib.timecode_to_frames(tc, fps)
+    except ValueError:
+        return 0
 
 
 # frame idx to tc string
-def frames_to_timecode(frame: int, fps: float, base_frame: int = 0) -> str:
+def frames_to_timecode(frame: int, fps: float, base_frame: int = 0, drop_frame: bool = False) -> str:
     
-    total = frame + base_frame
-    fps_i = int(round(fps))
-    if fps_i <= 0:
-        fps_i = 24
+    if fps <= 0:
+        fps = 24
 
-    total = int(round(total))
+    return tc_lib.frames_to_timecode(int(round(frame + base_frame)), fps, drop_frame)
 
-    secs, ff = divmod(total, fps_i)
-    mins, ss = divmod(secs, 60)
-    hrs, mm = divmod(mins, 60)
 
-    return f"{hrs:02d}:{mm:02d}:{ss:02d}:{ff:02d}"
+# the thumbnail dedupe below leans on openpyxl internals (ExcelWriter's
+# _write_images/_images/_archive, Image's _data/path/_id). it only gets used
+# on the versions it was checked against, and only if those hooks are all
+# still there. anything else gets a plain XLImage per thumbnail and the stock
+# writer, a bigger file but never a broken one
+DEDUP_OPENPYXL_VERSIONS = ("3.0", "3.1")
+
+
+@lru_cache(maxsize=None)
+def _can_dedup_images() -> bool:
+    version = ".".join(openpyxl.__version__.split(".")[:2])
+    if version not in DEDUP_OPENPYXL_VERSIONS:
+        return False
+
+    try:
+        writer = ExcelWriter(None, None)
+    except Exception:
+        return False
+
+    return (
+        callable(getattr(ExcelWriter, "_write_images", None))
+        and isinstance(getattr(writer, "_images", None), list)
+        and hasattr(writer, "_archive")
+        and callable(getattr(XLImage, "_data", None))
+        and isinstance(getattr(XLImage, "path", None), property)
+        and hasattr(XLImage, "_id")
+    )
 
 
 # build excel file with matches and planeshifter extras
+# stand in for a thumbnail thats byte for byte the same as one already in the
+# sheet, it points at the first copy's media file instead of carrying its own
+class _SharedImage(XLImage):
+
+    def __init__(self, original):
+        # no PIL open, everything comes off the original
+        self.original = original
+        self.ref = original.ref
+        self.width = original.width
+        self.height = original.height
+        self.format = original.format
+
+    @property
+    def path(self):
+        return self.original.path
+
+
+# stock openpyxl writer, except each media file only goes in the zip once
+class _DedupExcelWriter(ExcelWriter):
+
+    def _write_images(self):
+        written = set()
+        for img in self._images:
+            if img.path not in written:
+                written.add(img.path)
+                self._archive.writestr(img.path[1:], img._data())
+
+
+# write only workbook, rows stream out to disk as they're appended so memory
+# stays flat no matter how big the match table is. matches and planeshifter
+# ranges get their own sheets, and identical thumbnails only get embedded once
+# (when the openpyxl install allows it, see _can_dedup_images)
 def write_xls_with_planeshifter(output_xls_path, matches, tc_ranges):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "stuff"
+    wb = Workbook(write_only=True)
+    dedup = _can_dedup_images()
 
     # main match table, same as csv
+    ws = wb.create_sheet("matches")
     ws.append(["Location", "FrameRange"])
     for m in matches:
         loc = m["xytech_path"]
         for fr in m["frame_ranges"]:
             ws.append([loc, fr])
 
-    # add planeshifter tc stuff as extra section
+    # planeshifter tc stuff
     if tc_ranges:
-        ws.append([])  # blank row
-        ws.append(["ps_start_frame", "ps_end_frame", "ps_start_tc", "ps_end_tc", "ps_thumb"])
+        ps = wb.create_sheet("planeshifter")
+        ps.append(["ps_start_frame", "ps_end_frame", "ps_start_tc", "ps_end_tc", "ps_thumb"])
 
-        for r in tc_ranges:
-            ws.append([
+        embedded = {}  # content hash -> first XLImage with those bytes
+        for row, r in enumerate(tc_ranges, start=2):
+            ps.append([
                 r["start_frame"],
                 r["end_frame"],
                 r["start_tc"],
@@ -437,62 +1587,336 @@ def write_xls_with_planeshifter(output_xls_path, matches, tc_ranges):
                 "",  # placeholder for thumb
             ])
 
-        # drop thumbnails into the last column
-        start_row = ws.max_row - len(tc_ranges) + 1
-        thumb_col = 5  # column E
-
-        for i, r in enumerate(tc_ranges):
+            # drop thumbnail into column E
             thumb_path = r.get("thumb_path")
             if not thumb_path:
                 continue
 
-            row = start_row + i
-            cell_ref = ws.cell(row=row, column=thumb_col).coordinate
-
             try:
-                img = XLImage(thumb_path)
+                with open(thumb_path, "rb") as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+
+                if dedup and digest in embedded:
+                    img = _SharedImage(embedded[digest])
+                else:
+                    img = XLImage(thumb_path)
+                    embedded.setdefault(digest, img)
                 # sizes are already 96x74, but confirm
                 img.width = 96
                 img.height = 74
-                ws.add_image(img, cell_ref)
+                ps.add_image(img, f"E{row}")
             except Exception as e:
                 print(f"couldnt add img {thumb_path}: {e}")
 
-    wb.save(output_xls_path)
-    print(f"wrote xls to {output_xls_path}")
-
+        if dedup:
+            print(f"{len(embedded)} unique thumbnails embedded for {len(tc_ranges)} ranges")
+        else:
+            print(f"openpyxl {openpyxl.__version__} not checked for thumbnail dedupe, embedding every thumbnail")
 
-# cut a subclip from vid
-def render_clip(video_path, start_frame, end_frame, fps, idx):
-    
-    # figure out time in seconds
-    if fps <= 0:
-        fps = 24.0
+    writer_cls = _DedupExcelWriter if dedup else ExcelWriter
+    with ZipFile(output_xls_path, "w", ZIP_DEFLATED, allowZip64=True) as archive:
+        writer_cls(wb, archive).save()
+    print(f"wrote xls to {output_xls_path}")
 
-    start_sec = start_frame / fps
-    duration = (end_frame - start_frame) / fps
 
-    out_name = f"ps_clip_{idx:02d}.mp4"
+# keyframes of the first video stream as (frame num, -ss seconds) + its codec.
+# reads packet flags only, nothing gets decoded. cached since every clip asks.
+# frame nums count from the first video frame (not pts 0) and the seek time is
+# relative to the file start_time, same as ffmpeg's -ss
+@lru_cache(maxsize=8)
+def get_keyframes(video_path, fps):
 
     cmd = [
-        "ffmpeg",
-        "-y",               # overwrite
-        "-ss", str(start_sec),
-        "-i", video_path,
-        "-t", str(duration),
-        "-c:v", "libx264",
-        "-c:a", "aac",
-        out_name,
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags:stream=codec_name",
+        "-of", "json",
+        video_path,
     ]
 
-    subprocess.run(
+    result = subprocess.run(
         cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
     )
 
-    return out_name
+    if result.returncode != 0:
+        return None, []
+
+    data = json.loads(result.stdout or "{}")
+
+    streams = data.get("streams", [])
+    codec = streams[0].get("codec_name") if streams else None
+
+    params = get_stream_params(video_path)
+    stream_start = params["stream_start"]
+    fmt_start = stream_start - params["offset"]
+
+    # a stream copy starts on the last keyframe at or before the seek point, so
+    # seek a bit past it: half a frame for float error, plus the 3/23s ffmpeg
+    # itself backs off the seek by for streams with b-frames
+    lead = 0.5 / fps + (3 / 23 if params["has_b_frames"] else 0)
+
+    times = sorted(
+        float(pkt["pts_time"])
+        for pkt in data.get("packets", [])
+        if "K" in pkt.get("flags", "") and pkt.get("pts_time") not in (None, "N/A")
+    )
+
+    keys = []
+    for n, pts in enumerate(times):
+        frame = int(round((pts - stream_start) * fps))
+        seek = pts - fmt_start + lead
+        # next keyframe inside the lead, a seek there would land on that one
+        if n + 1 < len(times) and times[n + 1] - fmt_start <= seek:
+            seek = None
+        keys.append((frame, None if seek is None else f"{seek:.6f}"))
+
+    return codec, keys
+
+
+def _run_quiet(cmd) -> bool:
+    result = subprocess.run(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return result.returncode == 0
+
+
+# ffprobe profile names -> libx264 -profile:v
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+}
+
+
+# re-encode just [start, start + n) frames to a matroska h264 segment, with the
+# source's profile/level/pix_fmt so it can sit next to copied source gops.
+# seeking half a frame early means the float time never skips the first frame.
+# sps/pps get put in-band in front of every idr so each piece carries its own
+def _encode_segment(video_path, start_frame, n_frames, fps, out_path, params) -> bool:
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-ss", str(max(seek_seconds(video_path, start_frame - 0.5, fps), 0)),
+        "-i", video_path,
+        "-frames:v", str(n_frames),
+        "-an",
+        "-c:v", "libx264",
+    ]
+    if params.get("profile") in X264_PROFILES:
+        cmd += ["-profile:v", X264_PROFILES[params["profile"]]]
+    if params.get("level") and params["level"] > 0:
+        cmd += ["-level", f"{params['level'] / 10:.1f}"]
+    if params.get("pix_fmt"):
+        cmd += ["-pix_fmt", params["pix_fmt"]]
+    cmd += ["-bsf:v", "h264_mp4toannexb", out_path]
+
+    return _run_quiet(cmd)
+
+
+# true if an encoded segment has the same stream params as the source,
+# anything else and copied source gops wont decode after it
+def _segment_matches(seg_path, params) -> bool:
+    # temp files, no point keeping them in the on disk probe cache
+    seg = get_stream_params(seg_path, cache=probecache.ProbeCache(db_path=None))
+    return all(
+        seg.get(k) == params.get(k)
+        for k in ("codec", "profile", "pix_fmt", "width", "height")
+    ) and (not params.get("level") or not seg.get("level") or seg["level"] <= params["level"])
+
+
+# stream copy: encode the partial gops at the head and tail, copy the whole
+# gops in between, then concat + redo the audio. false means it couldnt be done
+def _smart_render(video_path, start_frame, end_frame, fps, out_name) -> bool:
+
+    params = get_stream_params(video_path)
+    codec, keys = get_keyframes(video_path, fps)
+
+    # head/tail get made with libx264, so the copied middle has to be h264 too
+    if codec != "h264" or not keys:
+        return False
+    if params.get("profile") not in X264_PROFILES:
+        # nothing libx264 can match (e.g. high 10 intra, mvc), dont risk it
+        return False
+
+    key_frames = [k for k, _ in keys]
+    i = bisect_left(key_frames, start_frame)
+    j = bisect_right(key_frames, end_frame) - 1
+    if i >= len(keys) or j < 0 or key_frames[j] <= key_frames[i]:
+        # not even one whole gop inside the range
+        return False
+
+    k1, k1_seek = keys[i]
+    k2 = key_frames[j]
+    if k1_seek is None:
+        # gop too short to seek onto reliably
+        return False
+
+    with tempfile.TemporaryDirectory(prefix="smart_") as tmp:
+        segs = []
+
+        if k1 > start_frame:
+            head = os.path.join(tmp, "head.mkv")
+            if not _encode_segment(video_path, start_frame, k1 - start_frame, fps, head, params):
+                return False
+            segs.append(head)
+
+        # seeking just past a keyframe lands exactly on it when copying
+        mid = os.path.join(tmp, "mid.mkv")
+        if not _run_quiet([
+            "ffmpeg",
+            "-y",
+            "-ss", k1_seek,
+            "-i", video_path,
+            "-frames:v", str(k2 - k1),
+            "-an",
+            "-c:v", "copy",
+            "-bsf:v", "h264_mp4toannexb",
+            mid,
+        ]):
+            return False
+        segs.append(mid)
+
+        if end_frame > k2:
+            tail = os.path.join(tmp, "tail.mkv")
+            if not _encode_segment(video_path, k2, end_frame - k2, fps, tail, params):
+                return False
+            segs.append(tail)
+
+        # libx264 didnt give us something that fits with the source gops
+        for seg in segs:
+            if seg != mid and not _segment_matches(seg, params):
+                print(f"smart render: {os.path.basename(seg)} doesnt match the source's h264 params")
+                return False
+
+        list_path = os.path.join(tmp, "segs.txt")
+        with open(list_path, "w") as f:
+            for seg in segs:
+                f.write(f"file '{seg}'\n")
+
+        # glue the video back together and pull the audio for the same span.
+        # every segment has its sps/pps in-band at its idrs (h264_mp4toannexb,
+        # the muxers keep them), avc3 tells players to use those over the avcC
+        return _run_quiet([
+            "ffmpeg",
+            "-y",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_path,
+            "-ss", str(seek_seconds(video_path, start_frame, fps)),
+            "-t", str((end_frame - start_frame) / fps),
+            "-i", video_path,
+            "-map", "0:v",
+            "-map", "1:a?",
+            "-c:v", "copy",
+            "-tag:v", "avc3",
+            "-c:a", "aac",
+            out_name,
+        ])
+
+
+# cut a subclip from vid
+# mode "smart" stream copies whole gops and only re-encodes the ends,
+# it drops back to a full encode whenever that isnt possible.
+# ffmpeg writes to a .part file that only gets renamed to out_name once it
+# exits cleanly, so a failed or ctrl-c'd encode never looks like a real clip.
+# returns out_name, or None if the encode failed
+def render_clip(video_path, start_frame, end_frame, fps, idx, mode="encode", out_name=None):
+    
+    # figure out time in seconds
+    if fps <= 0:
+        fps = 24.0
+
+    start_sec = seek_seconds(video_path, start_frame, fps)
+    duration = (end_frame - start_frame) / fps
+
+    if out_name is None:
+        out_name = f"ps_clip_{idx:02d}.mp4"
+
+    base, ext = os.path.splitext(out_name)
+    part = f"{base}.part{ext}"
+
+    try:
+        if mode == "smart":
+            if _smart_render(video_path, start_frame, end_frame, fps, part):
+                os.replace(part, out_name)
+                return out_name
+            print(f"smart render not possible for {out_name}, doing a full encode")
+
+        cmd = [
+            "ffmpeg",
+            "-y",               # overwrite
+            "-ss", str(start_sec),
+            "-i", video_path,
+            "-t", str(duration),
+            "-c:v", "libx264",
+            "-c:a", "aac",
+            part,
+        ]
+
+        if not _run_quiet(cmd):
+            print(f"ffmpeg failed rendering {out_name}")
+            return None
+
+        os.replace(part, out_name)
+        return out_name
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+
+
+_http_session = None
+_http_lock = threading.Lock()
+
+
+# POST /me/videos isnt idempotent, so it only gets retried when vimeo says it
+# didnt do anything: 429, or 503 with a Retry-After. timeouts and other 5xx
+# on a POST still raise since the video might have been made anyway
+class VimeoRetry(Retry):
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == "POST":
+            return bool(self.total) and (
+                status_code == 429 or (status_code == 503 and has_retry_after)
+            )
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+# one pooled session for every vimeo/tus call so connections get reused.
+# 429/5xx on the safe methods get retried with backoff (and Retry-After),
+# POST only on 429/503 (see VimeoRetry). PATCH isnt in there since
+# tus_upload does its own resume off the offset
+def get_http_session():
+    global _http_session
+
+    with _http_lock:
+        if _http_session is None:
+            retry = VimeoRetry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+
+    return _http_session
 
 
 # dont repeat headers for vimeo
@@ -503,8 +1927,59 @@ def vimeo_headers(token):
     }
 
 
+def tus_headers(offset=None):
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Accept": "application/vnd.vimeo.*+json;version=3.4",
+    }
+    if offset is not None:
+        headers["Upload-Offset"] = str(offset)
+        headers["Content-Type"] = "application/offset+octet-stream"
+    return headers
+
+
+# ask the tus server how much of the file it already has
+def tus_offset(upload_link):
+    resp = get_http_session().head(upload_link, headers=tus_headers(), timeout=HTTP_TIMEOUT)
+    resp.raise_for_status()
+    return int(resp.headers.get("Upload-Offset", 0))
+
+
+# send a file with tus one chunk at a time, straight off disk.
+# if a PATCH dies it HEADs for the real offset and carries on from there
+def tus_upload(upload_link, file_path, chunk_size=TUS_CHUNK_SIZE, max_retries=5):
+    size = os.path.getsize(file_path)
+
+    # could be partway done already if this is a resume
+    offset = tus_offset(upload_link)
+    retries = 0
+
+    with open(file_path, "rb") as f:
+        while offset < size:
+            f.seek(offset)
+            chunk = f.read(chunk_size)
+
+            try:
+                resp = get_http_session().patch(
+                    upload_link, headers=tus_headers(offset), data=chunk, timeout=HTTP_TIMEOUT
+                )
+                resp.raise_for_status()
+                offset = int(resp.headers.get("Upload-Offset", offset + len(chunk)))
+                retries = 0
+            except requests.RequestException as e:
+                retries += 1
+                if retries > max_retries:
+                    raise
+
+                print(f"tus chunk at {offset} for {file_path} failed ({e}), resuming")
+                time.sleep(min(2 ** retries, 30))
+                offset = tus_offset(upload_link)
+
+    return offset
+
+
 # vimeo upload
-def upload_clip_to_vimeo(token, file_path, title):
+def upload_clip_to_vimeo(token, file_path, title, chunk_size=TUS_CHUNK_SIZE):
     size = os.path.getsize(file_path)
 
     # create video object with tus upload
@@ -516,10 +1991,11 @@ def upload_clip_to_vimeo(token, file_path, title):
         "name": title,
     }
 
-    resp = requests.post(
-        "https://api.vimeo.com/me/videos",
+    resp = get_http_session().post(
+        f"{VIMEO_API}/me/videos",
         headers={**vimeo_headers(token), "Content-Type": "application/json"},
         json=create_data,
+        timeout=HTTP_TIMEOUT,
     )
     resp.raise_for_status()
     info = resp.json()
@@ -534,120 +2010,254 @@ def upload_clip_to_vimeo(token, file_path, title):
         return None
 
     # send the file with tus
-    with open(file_path, "rb") as f:
-        data = f.read()
-
-    tus_headers = {
-        "Tus-Resumable": "1.0.0",
-        "Upload-Offset": "0",
-        "Content-Type": "application/offset+octet-stream",
-        "Accept": "application/vnd.vimeo.*+json;version=3.4",
-    }
-
-    tus_resp = requests.patch(upload_link, headers=tus_headers, data=data)
-    tus_resp.raise_for_status()
+    tus_upload(upload_link, file_path, chunk_size)
 
     print(f"uploaded {file_path} to vimeo: {uri} ({link})")
     return {
         "title": title,
         "uri": uri,
         "link": link,
+        "upload_link": upload_link,
     }
 
 
-# dump a csv of account vids
-def write_vimeo_csv(token, csv_path):
-    url = "https://api.vimeo.com/me/videos"
+# dump a csv of account vids, follows paging.next and writes each page as it lands
+def write_vimeo_csv(token, csv_path, per_page=100):
+    session = get_http_session()
     headers = vimeo_headers(token)
 
-    resp = requests.get(url, headers=headers, params={"per_page": 50})
-    resp.raise_for_status()
-    data = resp.json()
-
-    items = data.get("data", [])
+    url = f"{VIMEO_API}/me/videos"
+    params = {
+        "per_page": per_page,
+        # only ask for what ends up in the csv
+        "fields": "name,uri,link,transcode.status,upload.status",
+    }
 
+    n_rows = 0
     with open(csv_path, "w", newline="") as f:
         w = csv.writer(f)
         w.writerow(["Title", "URI", "PublicLink", "Status"])
 
-        for vid in items:
-            title = vid.get("name")
-            uri = vid.get("uri")
-            link = vid.get("link")
-            # status can live under transcode or upload depending on account/settings
-            transcode = vid.get("transcode", {}) or {}
-            upload = vid.get("upload", {}) or {}
-            status = transcode.get("status") or upload.get("status")
+        while url:
+            resp = session.get(url, headers=headers, params=params, timeout=HTTP_TIMEOUT)
+            resp.raise_for_status()
+            data = resp.json()
+
+            for vid in data.get("data", []):
+                title = vid.get("name")
+                uri = vid.get("uri")
+                link = vid.get("link")
+                # status can live under transcode or upload depending on account/settings
+                transcode = vid.get("transcode", {}) or {}
+                upload = vid.get("upload", {}) or {}
+                status = transcode.get("status") or upload.get("status")
+
+                w.writerow([title, uri, link, status])
+                n_rows += 1
+            f.flush()
 
-            w.writerow([title, uri, link, status])
+            # next is a relative path that already has the query string baked in
+            nxt = (data.get("paging") or {}).get("next")
+            url = f"{VIMEO_API}{nxt}" if nxt else None
+            params = None
 
-    print(f"wrote vimeo csv to {csv_path}")
+    print(f"wrote {n_rows} vimeo videos to {csv_path}")
 
 ## func def end ##
 
 
-# argparse flags
-parser = argparse.ArgumentParser(
-    description="match baselight export to xytech locations and export csv"
-)
+def main():
+    # argparse flags
+    parser = argparse.ArgumentParser(
+        description="match baselight export to xytech locations and export csv"
+    )
 
-parser.add_argument(
-    "--baselight",
-    required=True,
-    help="path to baselight export text file"
-)
+    parser.add_argument(
+        "--baselight",
+        required=True,
+        nargs="+",
+        help="baselight export text file(s), globs or folders of .txt files"
+    )
 
-parser.add_argument(
-    "--xytech",
-    required=True,
-    help="path to xytech workorder text file"
-)
+    parser.add_argument(
+        "--xytech",
+        required=True,
+        nargs="+",
+        help="xytech workorder text file(s), globs or folders of .txt files"
+    )
 
-parser.add_argument(
-    "--process",
-    help="video file to process (trailer demo)"
-)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="processes to parse input files with (default: all cores)"
+    )
 
-parser.add_argument(
-    "--output",
-    help="excel file (xlsx) to write"
-)
+    parser.add_argument(
+        "--db-batch-size",
+        type=int,
+        default=1000,
+        help="docs per mongo bulk write (default: 1000)"
+    )
 
-parser.add_argument(
-    "--vimeo_token",
-    help="vimeo personal access token for upload/api"
-)
+    parser.add_argument(
+        "--storage-root",
+        action="append",
+        default=[],
+        help="extra storage root regex to strip, e.g. '/isilon\\d+/prod' (can repeat)"
+    )
 
-parser.add_argument(
-    "--vimeo_csv",
-    help="where to dump vimeo video info as csv"
-)
+    parser.add_argument(
+        "--format",
+        choices=MATCH_FORMATS,
+        default="csv",
+        help="match table format, parquet/arrow need pyarrow (default: csv)"
+    )
+
+    parser.add_argument(
+        "--match-output",
+        help="where to write the match table (default: match_output.<format>)"
+    )
+
+    parser.add_argument(
+        "--process",
+        help="video file to process (trailer demo)"
+    )
+
+    parser.add_argument(
+        "--show",
+        default=DEFAULT_SHOW,
+        help=f"show to pull frames for when processing video (default: {DEFAULT_SHOW})"
+    )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="clips to render at the same time when processing video (default: 1)"
+    )
 
-args = parser.parse_args()
+    parser.add_argument(
+        "--merge-gap",
+        type=int,
+        default=0,
+        help="merge handle ranges that are within this many frames of each other (default: 0, -1 = never merge)"
+    )
 
-# parse both txt files
-baselight_entries = parse_baselight_file(args.baselight)
-xytech_entries = load_xytech_locations(args.xytech)
+    parser.add_argument(
+        "--render-mode",
+        choices=["encode", "smart"],
+        default="encode",
+        help="encode = full re-encode, smart = stream copy whole gops and only re-encode the ends"
+    )
 
-matches = build_match_table(baselight_entries, xytech_entries)
+    parser.add_argument(
+        "--output",
+        help="excel file (xlsx) to write"
+    )
 
-output_csv = "match_output.csv"
-write_matches_to_csv(matches, output_csv)
+    parser.add_argument(
+        "--vimeo_token",
+        help="vimeo personal access token for upload/api"
+    )
+
+    parser.add_argument(
+        "--upload-jobs",
+        type=int,
+        default=4,
+        help="clips to upload to vimeo at the same time (default: 4)"
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        default=CACHE_DIR,
+        help=f"where rendered clips/thumbnails + the manifest are kept between runs (default: {CACHE_DIR})"
+    )
+
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=4096,
+        help="evict least recently used cached clips past this size (default: 4096, -1 = no limit)"
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="ignore the cache, re-render and re-upload everything"
+    )
+
+    parser.add_argument(
+        "--vimeo_csv",
+        help="where to dump vimeo video info as csv"
+    )
+
+    args = parser.parse_args()
+
+    if args.storage_root:
+        set_storage_roots(STORAGE_ROOTS + args.storage_root)
+
+    baselight_files = expand_inputs(args.baselight)
+    xytech_files = expand_inputs(args.xytech)
+    if not baselight_files:
+        parser.error("no baselight files found")
+    if not xytech_files:
+        parser.error("no xytech files found")
+
+    print(f"parsing {len(baselight_files)} baselight / {len(xytech_files)} xytech files w/ {args.workers} workers")
+
+    # parse all the txt files, baselight gets streamed so big exports stay cheap
+    xytech_entries = load_xytech_files(xytech_files, args.workers)
+
+    # one mongo connection for the whole batch, baselight gets saved as it streams by
+    db = get_db()
+    ensure_indexes(db)
+
+    baselight_blocks = iter_baselight_shards(baselight_files, args.workers)
+    matches = build_match_table(
+        tee_baselight_to_db(db, baselight_blocks, args.db_batch_size),
+        xytech_entries,
+    )
+    save_xytech_to_db(db, xytech_entries, batch_size=args.db_batch_size)
+
+    # say how each location got matched (exact path or a deeper baselight path)
+    for m in matches:
+        print(f"matched {m['xytech_path']} ({m['match_type']})")
+
+    # parse workers keep their own caches, this is just the main process
+    stats = path_cache_stats()
+    print(f"path cache: {stats['hits']} hits, {stats['misses']} misses, {stats['size']} cached")
+
+    output_path = args.match_output or f"match_output.{args.format}"
+    write_matches(matches, output_path, args.format)
+
+    # process vid
+    tc_ranges = None
+    if args.process:
+        cache = ArtifactCache(
+            args.cache_dir,
+            max_bytes=args.cache_max_mb * 1024 * 1024 if args.cache_max_mb >= 0 else None,
+            force=args.force,
+        )
+        tc_ranges = process_video(
+            args.process,
+            vimeo_token=args.vimeo_token,
+            show=args.show,
+            jobs=args.jobs,
+            render_mode=args.render_mode,
+            merge_gap=args.merge_gap if args.merge_gap >= 0 else None,
+            upload_jobs=args.upload_jobs,
+            cache=cache,
+        )
 
-# stash in mongo
-db = get_db()
-save_baselight_to_db(db, baselight_entries, args.baselight)
-save_xytech_to_db(db, xytech_entries, args.xytech)
+    # write xls
+    if args.output:
+        write_xls_with_planeshifter(args.output, matches, tc_ranges)
 
-# process vid
-tc_ranges = None
-if args.process:
-    tc_ranges = process_video(args.process, vimeo_token=args.vimeo_token)
+    # pull vimeo acc info
+    if args.vimeo_token and args.vimeo_csv:
+        write_vimeo_csv(args.vimeo_token, args.vimeo_csv)
 
-# write xls
-if args.output:
-    write_xls_with_planeshifter(args.output, matches, tc_ranges)
 
-# pull vimeo acc info
-if args.vimeo_token and args.vimeo_csv:
-    write_vimeo_csv(args.vimeo_token, args.vimeo_csv)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
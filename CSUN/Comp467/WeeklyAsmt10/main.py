@@ -1,20 +1,121 @@
 import argparse
+import os
+import sys
+
+import numpy as np
+
+# shared timecode helpers live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+import timecode as tc_lib
 
 fps = 24
 
-def frame_to_timecode(frame: int, fps: int = fps) -> str:
-    if frame <0:
-        raise ValueError("invalid input...")
-    seconds, frame_count = divmod(frame, fps)
-    hours, rem = divmod(seconds, 3600)
-    minutes, seconds = divmod(rem, 60)
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}:{frame_count:02d}"
+
+# pull whitespace separated frame numbers out of a binary stream a block at a
+# time, a number cut in half at the end of a block waits for the next one
+def iter_frame_chunks(stream, chunk_bytes):
+    leftover = b""
+    while True:
+        block = stream.read(chunk_bytes)
+        if not block:
+            break
+
+        block = leftover + block
+        cut = len(block)
+        while cut and not block[cut - 1:cut].isspace():
+            cut -= 1
+
+        leftover = block[cut:]
+        tokens = block[:cut].split()
+        if tokens:
+            yield np.array(tokens, dtype=np.int64)
+
+    if leftover.strip():
+        yield np.array(leftover.split(), dtype=np.int64)
+
+
+# every row looks like PREFIX frame MID timecode SUFFIX, so a whole chunk is
+# just two joins over the byte strings, no per frame python formatting
+ROW_FORMATS = {
+    "text": (b"", b" -> ", b"\n"),
+    "csv": (b"", b",", b"\n"),
+    "json": (b'  {"frame": ', b', "timecode": "', b'"}'),
+}
+
+
+def format_chunk(frames, tcs, fmt):
+    prefix, mid, suffix = ROW_FORMATS[fmt]
+    row_sep = suffix + (b",\n" if fmt == "json" else b"") + prefix
+    body = row_sep.join(map(mid.join, zip(frames.astype("S").tolist(), tcs.tolist())))
+    return prefix + body + suffix
+
+
+def convert(chunks, out, rate, drop_frame, fmt):
+    if fmt == "csv":
+        out.write(b"frame,timecode\n")
+    elif fmt == "json":
+        out.write(b"[\n")
+
+    first = True
+    for frames in chunks:
+        if frames.size == 0:
+            continue
+
+        tcs = tc_lib.frames_to_timecode_array(frames, rate, drop_frame)
+
+        if fmt == "json" and not first:
+            out.write(b",\n")
+        out.write(format_chunk(frames, tcs, fmt))
+        first = False
+
+    if fmt == "json":
+        out.write(b"\n]\n" if not first else b"]\n")
+
 
 parser = argparse.ArgumentParser(
     description = "convert frame number to timecode"
 )
-parser.add_argument("frames", nargs="+", type=int, help="frame numbers to convert")
+parser.add_argument("frames", nargs="*", type=int, help="frame numbers to convert (or pipe them in on stdin)")
+parser.add_argument("--input", "-i", help="file of whitespace/newline separated frame numbers, - for stdin")
+parser.add_argument("--output", "-o", help="write here instead of stdout")
+parser.add_argument("--fps", default=str(fps), help="frame rate, e.g. 24, 23.976, 29.97, 30000/1001 (default: 24)")
+parser.add_argument("--df", action="store_true", help="drop frame timecode (29.97/59.94 only)")
+parser.add_argument("--format", choices=["text", "csv", "json"], default="text", help="output format")
+parser.add_argument("--chunk-size", type=int, default=500_000, help="roughly how many frames to convert per chunk")
 args = parser.parse_args()
 
-for frame in args.frames:
-    print(f"{frame} -> {frame_to_timecode(frame)}")
\ No newline at end of file
+try:
+    rate = tc_lib.parse_rate(args.fps)
+    if args.df and not tc_lib.is_drop_frame_rate(rate):
+        raise ValueError("drop frame only works at 29.97/59.94")
+except ValueError as e:
+    parser.error(str(e))
+
+# a frame number + newline is ~8 bytes
+chunk_bytes = max(args.chunk_size, 1) * 8
+
+if args.frames:
+    source = None
+    chunks = iter([np.array(args.frames, dtype=np.int64)])
+elif args.input and args.input != "-":
+    source = open(args.input, "rb")
+    chunks = iter_frame_chunks(source, chunk_bytes)
+elif args.input == "-" or not sys.stdin.isatty():
+    source = None
+    chunks = iter_frame_chunks(sys.stdin.buffer, chunk_bytes)
+else:
+    parser.error("give some frame numbers, --input, or pipe them in")
+
+# one buffered binary writer for everything
+out = open(args.output, "wb", buffering=1 << 20) if args.output else sys.stdout.buffer
+
+try:
+    convert(chunks, out, rate, args.df, args.format)
+except ValueError as e:
+    parser.error(str(e))
+finally:
+    out.flush()
+    if args.output:
+        out.close()
+    if source is not None:
+        source.close()
@@ -1,6 +1,11 @@
 import argparse
-import ffmpeg
 import json
+import os
+import sys
+
+# shared helpers for all the comp467 tools live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+import probecache
 
 
 parser = argparse.ArgumentParser()
@@ -8,7 +13,10 @@ parser.add_argument("image", help = "image filepath")
 args = parser.parse_args()
 
 print ("image path: ", args.image)
-info = ffmpeg.probe(args.image)
+# same thing ffmpeg.probe runs (-show_format -show_streams), just cached
+info = probecache.probe(args.image, probecache.FORMAT_AND_STREAMS)
+if info is None:
+    parser.error(f"ffprobe couldnt read {args.image}")
 print(type(info), info.keys())
 print(json.dumps(info, indent=2))
 
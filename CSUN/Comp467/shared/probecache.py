@@ -0,0 +1,237 @@
+## shared ffprobe cache ##
+# used by the crucible, project 3 and weekly asmt 8
+# ffprobe on network storage costs a few hundred ms a pop, so parsed results get
+# kept in a little sqlite db keyed on (path, size, mtime, probe args). touching
+# or replacing the file changes the key, so stale results never come back.
+# there's an in memory lru in front of sqlite so repeat lookups in one run
+# are just a stat + dict hit. reading never writes: last_used bumps are held
+# in memory and written in one go at exit (flush), along with the eviction
+#
+# knobs (env vars, or pass them to ProbeCache):
+#   COMP467_PROBE_CACHE  sqlite file (default ~/.cache/comp467/probe.sqlite, "off" to disable)
+#   COMP467_PROBE_TTL    seconds before an entry counts as stale (default 7 days, 0 = forever)
+#   COMP467_PROBE_MAX    entries to keep, least recently used go first (default 5000)
+
+import atexit
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_DB = os.path.join(os.path.expanduser("~"), ".cache", "comp467", "probe.sqlite")
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+
+# last_used only gets rewritten once it's at least this old, lru order doesnt
+# need to be any finer than that
+TOUCH_EVERY = 3600
+
+# what project 3 / asmt 8 want, everything about the container + every stream
+FORMAT_AND_STREAMS = ("-show_format", "-show_streams")
+
+
+class ProbeCache:
+
+    def __init__(
+        self,
+        db_path: Optional[str] = DEFAULT_DB,
+        ttl: Optional[float] = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.ttl = ttl or None
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.memo: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+        self.touched: Dict[Tuple, float] = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+        # db_path=None keeps everything in memory for this run only
+        self.db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self.db = sqlite3.connect(db_path, check_same_thread=False)
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS probes ("
+                    " path TEXT, size INTEGER, mtime_ns INTEGER, args TEXT,"
+                    " data TEXT, stored_at REAL, last_used REAL,"
+                    " PRIMARY KEY (path, size, mtime_ns, args))"
+                )
+                self.db.execute("CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)")
+                self.db.commit()
+            except sqlite3.Error as e:
+                # read only home dir or whatever, just run without the disk cache
+                print(f"probe cache disabled ({db_path}): {e}")
+                self.db = None
+            else:
+                atexit.register(self.flush)
+
+    @staticmethod
+    def _key(path: str, args: Iterable[str]) -> Optional[Tuple]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.realpath(path), st.st_size, st.st_mtime_ns, json.dumps(list(args)))
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl is None or time.time() - stored_at < self.ttl
+
+    # into the memo, oldest one out once it's past max_entries (hold self.lock)
+    def _remember(self, key: Tuple, stored_at: float, data: Dict) -> None:
+        self.memo[key] = (stored_at, data)
+        self.memo.move_to_end(key)
+        if self.max_entries:
+            while len(self.memo) > self.max_entries:
+                self.memo.popitem(last=False)
+
+    # cached parsed dict or None. dont mutate what comes back, its shared
+    def get(self, path: str, args: Iterable[str] = FORMAT_AND_STREAMS) -> Optional[Dict]:
+        key = self._key(path, args)
+        if key is None:
+            return None
+
+        with self.lock:
+            hit = self.memo.get(key)
+            if hit and self._fresh(hit[0]):
+                self.memo.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT data, stored_at, last_used FROM probes"
+                    " WHERE path = ? AND size = ? AND mtime_ns = ? AND args = ?",
+                    key,
+                ).fetchone()
+                if row and self._fresh(row[1]):
+                    data = json.loads(row[0])
+                    self._remember(key, row[1], data)
+
+                    # bump last_used later, not with a write on every hit
+                    now = time.time()
+                    if now - (row[2] or 0) >= TOUCH_EVERY:
+                        self.touched[key] = now
+                        if len(self.touched) >= 1000:
+                            self._write_touched()
+                            self.db.commit()
+
+                    self.hits += 1
+                    return data
+
+            self.misses += 1
+            return None
+
+    def put(self, path: str, args: Iterable[str], data: Dict) -> None:
+        key = self._key(path, args)
+        if key is None:
+            return
+
+        now = time.time()
+        with self.lock:
+            self._remember(key, now, data)
+            if self.db is None:
+                return
+
+            self.db.execute(
+                "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, json.dumps(data), now, now),
+            )
+            self.touched.pop(key, None)
+            self.dirty = True
+            self.db.commit()
+
+    # pending last_used bumps out in one statement (hold self.lock, caller commits)
+    def _write_touched(self) -> None:
+        self.db.executemany(
+            "UPDATE probes SET last_used = ?"
+            " WHERE path = ? AND size = ? AND mtime_ns = ? AND args = ?",
+            [(t, *key) for key, t in self.touched.items()],
+        )
+        self.touched.clear()
+
+    # last_used bumps + eviction, one transaction per run. runs at exit on
+    # its own, call it sooner if the process sticks around
+    def flush(self) -> None:
+        with self.lock:
+            if self.db is None or not (self.touched or self.dirty):
+                return
+
+            try:
+                if self.touched:
+                    self._write_touched()
+                if self.dirty:
+                    self._evict()
+                    self.dirty = False
+                self.db.commit()
+            except sqlite3.Error as e:
+                print(f"probe cache flush failed: {e}")
+
+    # stale rows go, then the least recently used ones past max_entries
+    def _evict(self) -> None:
+        if self.ttl is not None:
+            self.db.execute("DELETE FROM probes WHERE stored_at < ?", (time.time() - self.ttl,))
+        if self.max_entries:
+            self.db.execute(
+                "DELETE FROM probes WHERE rowid IN ("
+                " SELECT rowid FROM probes ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self.lock:
+            self.memo.clear()
+            self.touched.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM probes")
+                self.db.commit()
+
+    # ffprobe -of json with the given args, cached. None if ffprobe failed
+    # (failures dont get cached, the file might just be mid copy)
+    def probe(self, path: str, args: Iterable[str] = FORMAT_AND_STREAMS) -> Optional[Dict]:
+        args = list(args)
+        data = self.get(path, args)
+        if data is not None:
+            return data
+
+        cmd = ["ffprobe", "-v", "error", *args, "-of", "json", str(path)]
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            return None
+
+        try:
+            data = json.loads(result.stdout or "{}")
+        except json.JSONDecodeError:
+            return None
+
+        self.put(path, args, data)
+        return data
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+# one process wide cache set up from the env vars
+def get_cache() -> ProbeCache:
+    global _default_cache
+
+    with _default_lock:
+        if _default_cache is None:
+            db_path = os.environ.get("COMP467_PROBE_CACHE", DEFAULT_DB)
+            _default_cache = ProbeCache(
+                db_path=None if db_path.lower() in ("", "off", "0") else db_path,
+                ttl=float(os.environ.get("COMP467_PROBE_TTL", DEFAULT_TTL)),
+                max_entries=int(os.environ.get("COMP467_PROBE_MAX", DEFAULT_MAX_ENTRIES)),
+            )
+        return _default_cache
+
+
+def probe(path: str, args: Iterable[str] = FORMAT_AND_STREAMS) -> Optional[Dict]:
+    return get_cache().probe(path, args)
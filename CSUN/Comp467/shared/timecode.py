@@ -0,0 +1,170 @@
+## shared timecode helpers ##
+# used by the crucible and weekly asmt 10
+# frame rates are kept as exact fractions (24000/1001 not 23.976) and
+# smpte drop frame is handled, so ntsc material doesnt drift over an hour
+
+from fractions import Fraction
+from functools import lru_cache
+from typing import List, Tuple, Union
+
+import numpy as np
+
+Rate = Union[Fraction, int, float, str]
+
+# float rates from ffprobe/argparse get snapped onto these
+STANDARD_RATES = [
+    Fraction(24000, 1001),
+    Fraction(24),
+    Fraction(25),
+    Fraction(30000, 1001),
+    Fraction(30),
+    Fraction(48),
+    Fraction(50),
+    Fraction(60000, 1001),
+    Fraction(60),
+]
+
+
+# "24000/1001", "23.976", 29.97, 24 -> exact Fraction
+@lru_cache(maxsize=64)
+def parse_rate(rate: Rate) -> Fraction:
+
+    if isinstance(rate, Fraction):
+        r = rate
+    elif isinstance(rate, str) and "/" in rate:
+        num, den = rate.split("/")
+        r = Fraction(int(num), int(den))
+    else:
+        r = Fraction(str(rate))
+
+    if r <= 0:
+        raise ValueError(f"invalid frame rate: {rate}")
+
+    # 23.976 and friends are really the 1001 rates
+    for std in STANDARD_RATES:
+        if abs(r - std) < Fraction(1, 100):
+            return std
+
+    return r
+
+
+# frames per timecode second, 24 for 23.976, 30 for 29.97 etc
+def nominal_fps(rate: Rate) -> int:
+    return int(round(parse_rate(rate)))
+
+
+def is_drop_frame_rate(rate: Rate) -> bool:
+    r = parse_rate(rate)
+    return r.denominator == 1001 and nominal_fps(r) % 30 == 0
+
+
+# frame numbers skipped at the start of each minute (except every 10th)
+def _drop_count(rate: Fraction) -> int:
+    return nominal_fps(rate) // 15
+
+
+def _check_drop(rate: Fraction, drop_frame: bool) -> None:
+    if drop_frame and not is_drop_frame_rate(rate):
+        raise ValueError(f"drop frame only works at 29.97/59.94, not {float(rate):.3f}")
+
+
+# timecode string to frame num, ; or . before the frames means drop frame
+def timecode_to_frames(tc: str, rate: Rate, drop_frame: bool = None) -> int:
+
+    r = parse_rate(rate)
+
+    tc = tc.strip()
+    if drop_frame is None:
+        drop_frame = ";" in tc or "." in tc
+
+    parts = tc.replace(";", ":").replace(".", ":").split(":")
+    if len(parts) != 4:
+        raise ValueError(f"bad timecode: {tc}")
+
+    h, m, s, f = (int(p) for p in parts)
+    nominal = nominal_fps(r)
+
+    total = ((h * 60 + m) * 60 + s) * nominal + f
+
+    if drop_frame:
+        _check_drop(r, True)
+        minutes = h * 60 + m
+        total -= _drop_count(r) * (minutes - minutes // 10)
+
+    return total
+
+
+# vectorized core, frame nums -> (hh, mm, ss, ff) arrays
+def frames_to_timecode_parts(
+    frames, rate: Rate, drop_frame: bool = False
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+
+    r = parse_rate(rate)
+    _check_drop(r, drop_frame)
+
+    frames = np.asarray(frames, dtype=np.int64)
+    if frames.size and frames.min() < 0:
+        raise ValueError("invalid input... frames cant be negative")
+
+    nominal = nominal_fps(r)
+
+    if drop_frame:
+        # add back the frame numbers that got skipped so plain math works after
+        d = _drop_count(r)
+        per_10min = nominal * 600 - d * 9
+        per_min = nominal * 60 - d
+
+        tens, rem = np.divmod(frames, per_10min)
+        extra = d * 9 * tens + d * np.maximum((rem - d) // per_min, 0)
+        frames = frames + extra
+
+    secs, ff = np.divmod(frames, nominal)
+    mins, ss = np.divmod(secs, 60)
+    hh, mm = np.divmod(mins, 60)
+
+    return hh, mm, ss, ff
+
+
+# batch version as a numpy bytes array (dtype S11), every digit gets written
+# straight into a uint8 buffer so there is no per frame python formatting
+def frames_to_timecode_array(frames, rate: Rate, drop_frame: bool = False) -> np.ndarray:
+
+    hh, mm, ss, ff = frames_to_timecode_parts(frames, rate, drop_frame)
+    sep = ";" if drop_frame else ":"
+
+    if hh.size and hh.max() > 99:
+        # 3+ digit hours, just do it the slow way
+        return np.array(
+            [
+                f"{h:02d}:{m:02d}:{s:02d}{sep}{f:02d}".encode()
+                for h, m, s, f in zip(hh.tolist(), mm.tolist(), ss.tolist(), ff.tolist())
+            ],
+            dtype="S",
+        )
+
+    buf = np.empty((hh.size, 11), dtype=np.uint8)
+    for col, vals in ((0, hh), (3, mm), (6, ss), (9, ff)):
+        buf[:, col] = 48 + vals // 10
+        buf[:, col + 1] = 48 + vals % 10
+    buf[:, 2] = buf[:, 5] = ord(":")
+    buf[:, 8] = ord(sep)
+
+    return buf.view("S11").reshape(-1)
+
+
+# batch version, one string per frame
+def frames_to_timecodes(frames, rate: Rate, drop_frame: bool = False) -> List[str]:
+    arr = frames_to_timecode_array(frames, rate, drop_frame)
+    if arr.size == 0:
+        return []
+    # one big join + split is way quicker than decoding each one
+    return b"\n".join(arr.tolist()).decode().split("\n")
+
+
+def frames_to_timecode(frame: int, rate: Rate, drop_frame: bool = False) -> str:
+    return frames_to_timecodes([frame], rate, drop_frame)[0]
+
+
+# exact wall clock seconds for a frame, for ffmpeg -ss and friends
+def frames_to_seconds(frame: int, rate: Rate) -> float:
+    return float(Fraction(int(frame)) / parse_rate(rate))